@@ -4,22 +4,30 @@ eventlet.monkey_patch(os=False)
 
 import os
 import time
-import json
+import functools
 import logging
-import requests 
 import pygame.mixer
 import keyboard
 
 from flask import Flask, session, request, redirect, url_for, render_template, jsonify, send_from_directory
-from flask_socketio import SocketIO, emit
+from flask_socketio import SocketIO, emit, join_room, leave_room
 from dotenv import load_dotenv
 from werkzeug.middleware.proxy_fix import ProxyFix
 from werkzeug.utils import secure_filename
 
 # --- MÓDULOS CUSTOMIZADOS ---
 # Importe após o monkey_patch para garantir que usem sockets patched
-from services.obs_manager import obs_manager
+from services.obs_manager import obs_manager, obs_registry, DEFAULT_INSTANCE
 from services.vts_manager import vts_manager
+from services.twitch_client import helix, PRIORITY_BACKGROUND
+from services.stream_stats import stream_poller
+from services.action_dispatcher import dispatcher
+from services.macro_engine import macro_engine
+from services.button_state import button_states, instance_target, split_target
+from services.panel_views import panel_views
+from services.deck_index import REF_FIELDS
+from services.obs_thumbnails import THUMBNAIL_ICON
+from services.deck_store import deck_store, DeckConflictError, set_button_op, delete_button_op, set_deck_op, ensure_deck_op
 from utils.security import is_safe_file
 
 # --- CONFIGURAÇÃO DE LOGGING ---
@@ -56,11 +64,88 @@ try:
 except Exception as e:
     logger.warning(f"Sem áudio (pygame): {e}")
 
-# Configura OBS (Singleton)
-obs_manager.configure(
-    host=os.getenv("OBS_HOST", "127.0.0.1"),
-    port=int(os.getenv("OBS_PORT", 4455)),
-    password=os.getenv("OBS_PASSWORD")
+# Configura OBS (uma conexão por instância, estado espelhado por eventos)
+def obs_event_handler(instance, event_type, data):
+    if event_type == "PATCH":
+        socketio.emit("obs_state_patch", {**data, "instance": instance}, namespace="/dashboard")
+    elif event_type == "TARGET":
+        target, value = data
+        button_states.observe(instance_target(instance, target), value)
+    elif event_type == "STATUS":
+        # Só transições (conectou / caiu), não cada tentativa do supervisor
+        socketio.emit("obs_status", {**data, "instance": instance}, namespace="/dashboard")
+        if data["connected"]:
+            emit_scene_details(obs_registry.get(instance))
+            sync_button_states_from_obs(instance)
+            if instance == DEFAULT_INSTANCE:
+                obs_manager.meters.update()
+                obs_manager.thumbnails.update()
+    elif event_type == "THUMBNAIL":
+        socketio.emit("obs_thumbnail", data, namespace="/dashboard")
+    elif event_type == "METER_LAYOUT":
+        socketio.emit("meter_layout", data, to=f"meters:{data['deck_id']}", namespace="/dashboard")
+    elif event_type == "METER_FRAME":
+        deck_id, frame = data
+        socketio.emit("meter_frame", frame, to=f"meters:{deck_id}", namespace="/dashboard")
+
+def emit_scene_details(manager, to=None):
+    details = manager.get_scene_details()
+    if details:
+        socketio.emit("obs_scene_details_data", {**details, "instance": manager.name}, to=to, namespace="/dashboard")
+
+def obs_settings(name):
+    """Conexão de cada OBS: o padrão em OBS_HOST/...; os extras (OBS_INSTANCES=jogo,stream) em OBS_JOGO_HOST/..."""
+    prefix = "OBS_" if name == DEFAULT_INSTANCE else f"OBS_{name.upper()}_"
+    return {
+        "host": os.getenv(f"{prefix}HOST", "127.0.0.1"),
+        "port": int(os.getenv(f"{prefix}PORT", 4455)),
+        "password": os.getenv(f"{prefix}PASSWORD"),
+    }
+
+for name in [n.strip() for n in os.getenv("OBS_INSTANCES", "").split(",") if n.strip()]:
+    obs_registry.add(name)
+
+for manager in obs_registry.all():
+    manager.configure(
+        **obs_settings(manager.name),
+        callback=functools.partial(obs_event_handler, manager.name),
+        queue_size=int(os.getenv("OBS_QUEUE_SIZE", 64)),
+        command_timeout=float(os.getenv("OBS_COMMAND_TIMEOUT", 5)),
+        request_timeout=float(os.getenv("OBS_REQUEST_TIMEOUT", 1)),
+        debounce=float(os.getenv("OBS_DEBOUNCE_MS", 120)) / 1000
+    )
+
+# Medidores de áudio: só das entradas usadas nas pastas visíveis de quem pediu
+def meter_targets():
+    index = deck_store.compiled()
+    return {deck_id: index.deck_refs(deck_id, "input") for deck_id in panel_views.decks("meters")}
+
+obs_manager.meters.configure(fps=float(os.getenv("OBS_METER_FPS", 10)), targets=meter_targets)
+
+# Miniaturas: só as dos botões nas pastas visíveis agora
+def thumbnail_targets():
+    index = deck_store.compiled()
+    return {s for deck_id in panel_views.decks() for s in index.deck_thumbnails(deck_id, THUMBNAIL_ICON)}
+
+obs_manager.thumbnails.configure(
+    ttl=float(os.getenv("OBS_THUMB_TTL", 5)),
+    max_per_sec=float(os.getenv("OBS_THUMB_RATE", 2)),
+    targets=thumbnail_targets
+)
+
+# Configura Deck (Singleton, cache em memória + journal; compacta em background)
+def deck_event_handler(event_type, data):
+    if event_type == "RELOADED":
+        # Arquivo editado por fora: painéis comparam ETags e rebaixam só o que mudou
+        socketio.emit("deck_index", data, namespace="/dashboard")
+    elif event_type == "PATCH":
+        # Vem do writer do deck, na ordem das versões
+        socketio.emit("deck_patch", data, namespace="/dashboard")
+
+deck_store.configure(
+    DECK_CONFIG_FILE,
+    flush_delay=float(os.getenv("DECK_FLUSH_DELAY", 5)),
+    callback=deck_event_handler
 )
 
 # Configura VTS (Singleton)
@@ -76,43 +161,96 @@ vts_manager.configure(
     token_file=os.path.join(os.path.dirname(__file__), "vts_token.json"),
     callback=vts_event_handler
 )
+# Parâmetros injetados no VTS (faders/macros): um pedido por frame, no máximo
+vts_manager.params.configure(fps=float(os.getenv("VTS_PARAM_FPS", 30)))
+
+def start_supervisors():
+    # Um supervisor por OBS e um do VTS: conectam agora e reconectam sozinhos com backoff
+    for manager in obs_registry.all():
+        manager.start()
+    vts_manager.start()
+
+# Com `python app.py` (debug) o reloader importa este arquivo também no processo pai,
+# que só vigia os arquivos: as conexões ficam só no processo que serve
+if __name__ != "__main__" or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+    start_supervisors()
+
+# Cliente Helix único (pool keep-alive + rate limit compartilhado entre as rotas)
+helix.configure(client_id=CLIENT_ID, api_url=TWITCH_API_URL)
+
+# Viewers/título: um poller por canal no servidor, empurrado só para quem se inscreveu
+def stream_stats_handler(event_type, data):
+    if event_type == "STATS":
+        socketio.emit("stream_stats", data, to=f"twitch:{data['broadcaster_id']}", namespace="/dashboard")
+
+stream_poller.configure(
+    callback=stream_stats_handler,
+    live_interval=float(os.getenv("TWITCH_LIVE_POLL", 30)),
+    offline_interval=float(os.getenv("TWITCH_OFFLINE_POLL", 90))
+)
+
+# Configura Macros (green threads; eventos de início/fim para os painéis)
+def macro_event_handler(event_type, data):
+    socketio.emit(f"macro_{event_type.lower()}", data, namespace="/dashboard")
+
+# Ações OBS seguidas num mesmo botão saem num único RequestBatch
+dispatcher.configure(batch_sender=obs_manager.batch)
+
+macro_engine.configure(runner=dispatcher.run_one, callback=macro_event_handler)
+
+# Configura estado dos toggles (o servidor é a fonte da verdade; só deltas vão aos painéis)
+def button_state_handler(event_type, data):
+    if event_type == "CHANGED":
+        socketio.emit("button_states", {"states": data, "full": False}, namespace="/dashboard")
+
+button_states.configure(callback=button_state_handler)
 
 # --- HELPERS ---
 
-def get_twitch_headers():
+def get_twitch_token():
     token = session.get('access_token')
     if not token:
         # Se não tiver token na sessão, tenta renovar ou falha
         raise ValueError("Token de acesso não encontrado.")
-    return {
-        "Client-Id": CLIENT_ID,
-        "Authorization": f"Bearer {token}"
-    }
+    return token
 
-def read_deck_config():
-    default_config = {"decks": {"root": {}}, "settings": {"start_deck": "root"}}
-    if not os.path.exists(DECK_CONFIG_FILE):
-        try:
-            with open(DECK_CONFIG_FILE, 'w', encoding='utf-8') as f:
-                json.dump(default_config, f, indent=4)
-        except: return default_config
-        return default_config
+def submit_deck_ops(ops, data, **extra):
+    """
+    Envia as ops para o writer do deck com a versão base informada pelo cliente.
+    Devolve a resposta HTTP (409 se a base estiver velha); o patch quem publica é o writer.
+    """
     try:
-        with open(DECK_CONFIG_FILE, 'r', encoding='utf-8') as f:
-            config = json.load(f)
-            if "decks" not in config: config["decks"] = {"root": {}}
-            return config
-    except:
-        return default_config
-
-def write_deck_config(data):
-    try:
-        with open(DECK_CONFIG_FILE, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=4)
-        return True
-    except Exception as e:
-        logger.error(f"Erro ao salvar deck: {e}")
-        return False
+        patch = deck_store.submit(ops, data.get('base_version'), data.get('base_epoch'))
+    except DeckConflictError as e:
+        return jsonify({"error": str(e), "conflict": True, "version": e.current_version}), 409
+    if patch is None: return jsonify({"error": "Erro ao salvar"}), 500
+    return jsonify({"success": True, "version": patch.get("version", deck_store.version), **extra})
+
+def collect_known_refs():
+    """Valores que existem de fato agora (None = serviço offline, não checar)."""
+    known = {"scene": None, "source": None, "input": None, "vts_hotkey": None}
+    # Vale o que existir em qualquer OBS conectado
+    for manager in obs_registry.all():
+        details = manager.get_scene_details()
+        if not details: continue
+        known["scene"] = (known["scene"] or set()) | {s["name"] for s in details["scenes"]}
+        known["source"] = (known["source"] or set()) | {src["name"] for s in details["scenes"] for src in s["sources"]}
+        known["input"] = (known["input"] or set()) | {i["name"] for i in details["audio_inputs"]}
+    if vts_manager.is_connected and vts_manager.hotkeys:
+        known["vts_hotkey"] = {h.get("hotkeyID") for h in vts_manager.hotkeys}
+    sounds_dir = os.path.join(os.path.dirname(__file__), "sounds")
+    known["sound"] = set(os.listdir(sounds_dir)) if os.path.isdir(sounds_dir) else set()
+    return known
+
+def conditional_json(etag, build):
+    """Responde 304 se o cliente já tem esta versão (If-None-Match); senão monta o JSON."""
+    if request.if_none_match.contains(etag):
+        resp = app.response_class(status=304)
+    else:
+        resp = jsonify(build())
+    resp.set_etag(etag)
+    resp.headers['Cache-Control'] = 'no-cache'
+    return resp
 
 # --- ROTAS HTTP ---
 
@@ -141,18 +279,13 @@ def auth_callback():
         "code": code, "grant_type": "authorization_code", "redirect_uri": redirect_uri
     }
     try:
-        res = requests.post(TWITCH_TOKEN_URL, data=params)
-        res.raise_for_status()
-        data = res.json()
+        data = helix.post_form(TWITCH_TOKEN_URL, params).json()
         
         session['access_token'] = data['access_token']
         session['refresh_token'] = data.get('refresh_token')
         
         # Busca dados do usuário
-        headers = {"Client-Id": CLIENT_ID, "Authorization": f"Bearer {data['access_token']}"}
-        user_res = requests.get(f"{TWITCH_API_URL}/users", headers=headers)
-        user_res.raise_for_status()
-        user_data = user_res.json()['data'][0]
+        user_data = helix.get("users", data['access_token']).json()['data'][0]
         
         session['user_id'] = user_data['id']
         session['nickname'] = user_data['login']
@@ -177,7 +310,88 @@ def dashboard():
 @app.route('/api/deck_config')
 def get_deck_config_api():
     if 'access_token' not in session: return jsonify({"error": "Unauthorized"}), 401
-    return jsonify(read_deck_config())
+    return jsonify(deck_store.get_versioned())
+
+@app.route('/api/decks')
+def get_deck_index_api():
+    if 'access_token' not in session: return jsonify({"error": "Unauthorized"}), 401
+    return conditional_json(deck_store.index_etag(), deck_store.get_index)
+
+@app.route('/api/decks/<deck_id>')
+def get_deck_api(deck_id):
+    if 'access_token' not in session: return jsonify({"error": "Unauthorized"}), 401
+    etag = deck_store.deck_etag(deck_id)
+    if etag is None: return jsonify({"error": "Deck não encontrado"}), 404
+    return conditional_json(etag, lambda: {
+        "deck_id": deck_id, "buttons": deck_store.get_deck(deck_id), "version": deck_store.version
+    })
+
+@app.route('/api/deck_validate')
+def deck_validate_api():
+    if 'access_token' not in session: return jsonify({"error": "Unauthorized"}), 401
+    return jsonify(deck_store.compiled().validate(collect_known_refs()))
+
+@app.route('/api/obs_metrics')
+def obs_metrics_api():
+    """Fila de comandos do OBS: profundidade, coalescências e latências."""
+    if 'access_token' not in session: return jsonify({"error": "Unauthorized"}), 401
+    return jsonify({m.name: {"connected": m.is_connected, "worker": m.worker.stats()} for m in obs_registry.all()})
+
+@app.route('/api/twitch_metrics')
+def twitch_metrics_api():
+    """Chamadas à Helix: pontos de rate limit restantes, esperas e retries."""
+    if 'access_token' not in session: return jsonify({"error": "Unauthorized"}), 401
+    return jsonify(helix.stats())
+
+@app.route('/api/vts_metrics')
+def vts_metrics_api():
+    """Pedidos ao VTS: pendentes, erros e tempo de resposta por tipo."""
+    if 'access_token' not in session: return jsonify({"error": "Unauthorized"}), 401
+    return jsonify(vts_manager.stats())
+
+@app.route('/api/obs_thumbnail')
+def obs_thumbnail_api():
+    """Miniatura JPEG de uma cena/fonte. Com ?v=<etag> atual pode ficar no cache do navegador."""
+    if 'access_token' not in session: return jsonify({"error": "Unauthorized"}), 401
+    thumb = obs_manager.thumbnails.get(request.args.get('source', ''))
+    if not thumb: return jsonify({"error": "Miniatura indisponível"}), 404
+    data, etag = thumb
+    if request.if_none_match.contains(etag):
+        resp = app.response_class(status=304)
+    else:
+        resp = app.response_class(data, mimetype='image/jpeg')
+    resp.set_etag(etag)
+    resp.headers['Cache-Control'] = 'private, max-age=86400, immutable' if request.args.get('v') == etag else 'no-cache'
+    return resp
+
+@app.route('/api/deck_search')
+def deck_search_api():
+    if 'access_token' not in session: return jsonify({"error": "Unauthorized"}), 401
+    index = deck_store.compiled()
+    kind, value = request.args.get('kind'), request.args.get('value')
+    if kind and value:
+        # Busca exata por referência (ex.: kind=scene&value=Cena 1)
+        return jsonify({"version": index.version, "results": index.uses(kind, value)})
+    # limit inválido vira o padrão; fica entre 1 e 500
+    limit = max(1, min(500, request.args.get('limit', 50, type=int)))
+    return jsonify(index.search(request.args.get('q', ''), request.args.get('type'), limit))
+
+@app.route('/api/deck_rewrite', methods=['POST'])
+def deck_rewrite_api():
+    """Troca uma referência (cena, fonte, entrada, som...) em todas as pastas de uma vez."""
+    if 'access_token' not in session: return jsonify({"error": "Unauthorized"}), 401
+    data = request.json
+    kind, old, new = data.get('kind'), data.get('old'), data.get('new')
+    if kind not in REF_FIELDS or not old or not new:
+        return jsonify({"error": "Informe kind, old e new"}), 400
+
+    index = deck_store.compiled()
+    edited = index.rewrite_buttons(kind, old, new, data.get('scene'))
+    ops = [set_button_op(deck_id, slot_id, button) for deck_id, slot_id, button in edited]
+    # Sem base informada, a troca vale contra a versão que acabou de ser lida
+    data.setdefault('base_version', index.version)
+    data.setdefault('base_epoch', deck_store.epoch)
+    return submit_deck_ops(ops, data, changed=len(ops))
 
 @app.route('/api/save_button', methods=['POST'])
 def save_button():
@@ -185,62 +399,46 @@ def save_button():
     data = request.json
     slot, deck, config = data.get('slot_id'), data.get('deck_id', 'root'), data.get('config')
     
-    full_config = read_deck_config()
-    if deck not in full_config['decks']: full_config['decks'][deck] = {}
-    full_config['decks'][deck][slot] = config
+    ops = [set_button_op(deck, slot, config)]
     
-    # Criação de sub-pastas
+    # Criação de sub-pastas (o writer ignora as que já existirem)
     if config.get("actions_on"):
         for action in config["actions_on"]:
             if action.get("type") == "open_deck":
                 new_id = action.get("params", {}).get("deck_id")
-                if new_id and new_id != "root" and new_id not in full_config["decks"]:
-                    full_config["decks"][new_id] = {}
-                    full_config["decks"][new_id]["slot-0"] = {
-                        "label": "Voltar", "icon": "fa-solid fa-arrow-left", "is_stateful": False,
-                        "actions_on": [{"type": "open_deck", "params": {"deck_id": deck}}], "actions_off": []
-                    }
-
-    if write_deck_config(full_config):
-        socketio.emit('deck_updated', full_config, namespace='/dashboard')
-        return jsonify({"success": True})
-    return jsonify({"error": "Erro ao salvar"}), 500
+                if new_id and new_id != "root":
+                    ops.append(ensure_deck_op(new_id, {
+                        "slot-0": {
+                            "label": "Voltar", "icon": "fa-solid fa-arrow-left", "is_stateful": False,
+                            "actions_on": [{"type": "open_deck", "params": {"deck_id": deck}}], "actions_off": []
+                        }
+                    }))
+
+    return submit_deck_ops(ops, data)
 
 @app.route('/api/delete_button', methods=['POST'])
 def delete_button():
     if 'access_token' not in session: return jsonify({"error": "Unauthorized"}), 401
     data = request.json
     slot, deck = data.get('slot_id'), data.get('deck_id', 'root')
-    
-    full_config = read_deck_config()
-    if deck in full_config['decks'] and slot in full_config['decks'][deck]:
-        del full_config['decks'][deck][slot]
-        if write_deck_config(full_config):
-            socketio.emit('deck_updated', full_config, namespace='/dashboard')
-    return jsonify({"success": True})
+    return submit_deck_ops([delete_button_op(deck, slot)], data)
 
 @app.route('/api/save_deck_layout', methods=['POST'])
 def save_layout():
     if 'access_token' not in session: return jsonify({"error": "Unauthorized"}), 401
     data = request.json
     deck, layout = data.get('deck_id'), data.get('buttons')
-    
-    full_config = read_deck_config()
-    if deck not in full_config['decks']: full_config['decks'][deck] = {}
-    full_config['decks'][deck] = layout
-    
-    if write_deck_config(full_config):
-        socketio.emit('deck_updated', full_config, namespace='/dashboard', skip_sid=request.sid)
-        return jsonify({"success": True})
-    return jsonify({"error": "Failed"}), 500
+    # Vai também para quem reordenou: o patch avança a versão local dele
+    return submit_deck_ops([set_deck_op(deck, layout)], data)
 
 @app.route('/api/channel_info')
 def channel_info():
     if 'access_token' not in session: return jsonify({"error": "Unauthorized"}), 401
+    uid = session.get('user_id')
+    cached = stream_poller.cached(uid)
+    if cached: return jsonify({"title": cached["title"] or "Offline", "category": cached["category"] or "N/A"})
     try:
-        uid = session.get('user_id')
-        res = requests.get(f"{TWITCH_API_URL}/channels?broadcaster_id={uid}", headers=get_twitch_headers())
-        res.raise_for_status()
+        res = helix.get("channels", get_twitch_token(), params={"broadcaster_id": uid}, priority=PRIORITY_BACKGROUND)
         data = res.json()['data']
         if not data: return jsonify({"title": "Offline", "category": "N/A"})
         return jsonify({"title": data[0]['title'], "category": data[0]['game_name']})
@@ -250,10 +448,13 @@ def channel_info():
 @app.route('/api/stream_stats')
 def stream_stats():
     if 'access_token' not in session: return jsonify({"error": "Unauthorized"}), 401
+    uid = session.get('user_id')
+    cached = stream_poller.cached(uid)
+    if cached:
+        if cached["status"] == "online": return jsonify({"status": "online", "viewer_count": cached["viewer_count"]})
+        return jsonify({"status": "offline"})
     try:
-        uid = session.get('user_id')
-        res = requests.get(f"{TWITCH_API_URL}/streams?user_id={uid}", headers=get_twitch_headers())
-        res.raise_for_status()
+        res = helix.get("streams", get_twitch_token(), params={"user_id": uid}, priority=PRIORITY_BACKGROUND)
         data = res.json()['data']
         if data:
             return jsonify({"status": "online", "viewer_count": data[0]['viewer_count']})
@@ -267,9 +468,9 @@ def update_channel():
     data = request.json
     try:
         uid = session['user_id']
-        headers = get_twitch_headers()
-        headers['Content-Type'] = 'application/json'
-        requests.patch(f"{TWITCH_API_URL}/channels?broadcaster_id={uid}", headers=headers, json=data)
+        helix.patch("channels", get_twitch_token(), params={"broadcaster_id": uid}, json=data)
+        # Todos os painéis veem o título novo já, não no próximo ciclo
+        stream_poller.refresh(uid)
         return jsonify({"success": True})
     except Exception as e:
         logger.error(f"Erro ao atualizar canal: {e}")
@@ -296,86 +497,306 @@ def upload_image():
 def handle_connect():
     if 'access_token' not in session: return False
     
-    # Conecta OBS em background (uma vez)
-    socketio.start_background_task(background_obs_connect)
+    # A conexão com cada OBS é do supervisor; o painel só recebe o status atual
+    emit("obs_instances", {"instances": obs_registry.names()})
+    for manager in obs_registry.all():
+        emit("obs_status", {"instance": manager.name, "connected": manager.is_connected,
+                            "message": "Conectado" if manager.is_connected else "Desconectado"})
     
-    # Inicia VTS se necessário e envia status
-    vts_manager.start()
-    vts_manager.request_hotkeys()
+    # A conexão com o VTS também é de um supervisor; as hotkeys vêm do cache
+    emit("vts_data_list", {"hotkeys": vts_manager.hotkeys, "model_id": vts_manager.model_id})
+    
+    emit("button_states", {"states": button_states.snapshot(), "full": True})
     
     if vts_manager.is_connected:
         emit("vts_status", {"connected": True, "message": "VTS Online"})
     else:
         emit("vts_status", {"connected": False, "message": "VTS Offline"})
 
-def background_obs_connect():
-    """Tenta conectar OBS e envia status."""
-    success = obs_manager.connect()
-    msg = "Conectado" if success else "Desconectado"
-    socketio.emit("obs_status", {"connected": success, "message": msg}, namespace="/dashboard")
-    if success:
-        data = obs_manager.get_scene_details()
-        if data: socketio.emit("obs_scene_details_data", data, namespace="/dashboard")
+def sync_button_states_from_obs(instance=None):
+    """Lê do OBS o estado real de tudo que algum botão toggle espelha (de um OBS ou de todos)."""
+    for target in button_states.bound_targets():
+        name, plain = split_target(target)
+        if instance and name != instance: continue
+        if name not in obs_registry.managers: continue
+        value = obs_registry.get(name).query_state(plain)
+        if value is not None: button_states.observe(target, value)
+
+@socketio.on("disconnect", namespace="/dashboard")
+def handle_disconnect():
+    stream_poller.unsubscribe(request.sid)
+    # Faders desse painel param de segurar parâmetros no VTS
+    vts_manager.params.release(source=request.sid)
+    if panel_views.remove(request.sid):
+        obs_manager.meters.update()
+
+# --- O que cada painel está vendo (para streams ao vivo) ---
+@socketio.on("view_deck", namespace="/dashboard")
+def view_deck(data):
+    deck_id = data.get("deck_id") or "root"
+    previous = panel_views.set_deck(request.sid, deck_id)
+    obs_manager.thumbnails.update()
+    if panel_views.get(request.sid)["meters"] and previous != deck_id:
+        if previous: leave_room(f"meters:{previous}")
+        join_room(f"meters:{deck_id}")
+        obs_manager.meters.refresh_layout(deck_id)
+        obs_manager.meters.update()
+
+@socketio.on("meters_subscribe", namespace="/dashboard")
+def meters_subscribe(data):
+    """Liga/desliga os medidores de áudio (opt-in) para este painel."""
+    view = panel_views.get(request.sid)
+    enabled = bool(data.get("enabled"))
+    if view["deck_id"]:
+        if enabled:
+            join_room(f"meters:{view['deck_id']}")
+            obs_manager.meters.refresh_layout(view["deck_id"])
+        else:
+            leave_room(f"meters:{view['deck_id']}")
+    panel_views.set_option(request.sid, "meters", enabled)
+    obs_manager.meters.update()
 
 # --- Eventos de Reconexão Manual ---
 @socketio.on("reconnect_obs", namespace="/dashboard")
-def manual_obs_reconnect():
-    socketio.start_background_task(background_obs_connect)
+def manual_obs_reconnect(data=None):
+    instance = (data or {}).get("instance")
+    for manager in ([obs_registry.get(instance)] if instance in obs_registry.managers else obs_registry.all()):
+        manager.reconnect_now()
 
 @socketio.on("reconnect_vts", namespace="/dashboard")
 def manual_vts_reconnect():
-    vts_manager.start()
+    vts_manager.reconnect_now()
     status = "Online" if vts_manager.is_connected else "Tentando..."
     emit("vts_status", {"connected": vts_manager.is_connected, "message": status}, namespace="/dashboard")
 
 # --- Eventos de Ação ---
+@socketio.on("get_vts_data", namespace="/dashboard")
+def get_vts_data():
+    emit("vts_data_list", {"hotkeys": vts_manager.hotkeys, "model_id": vts_manager.model_id})
+
 @socketio.on("get_obs_scene_details", namespace="/dashboard")
-def get_obs_details():
-    data = obs_manager.get_scene_details()
-    if data: emit("obs_scene_details_data", data, namespace="/dashboard")
+def get_obs_details(data=None):
+    instance = (data or {}).get("instance")
+    for manager in ([obs_registry.get(instance)] if instance in obs_registry.managers else obs_registry.all()):
+        emit_scene_details(manager, to=request.sid)
+
+@socketio.on("press_button", namespace="/dashboard")
+def press_button(data):
+    """Executa todas as ações do botão no servidor e devolve um único ack."""
+    return dispatcher.press(data.get("deck_id", "root"), data.get("slot_id"), data.get("turn_on", True))
+
+@socketio.on("macro_status", namespace="/dashboard")
+def macro_status():
+    return macro_engine.status()
+
+@socketio.on("cancel_macro", namespace="/dashboard")
+def cancel_macro(data):
+    macro_id = data.get("macro_id") or macro_engine.by_key.get(f"{data.get('deck_id')}/{data.get('slot_id')}")
+    return {"cancelled": macro_engine.cancel(macro_id)}
 
 @socketio.on("set_obs_scene", namespace="/dashboard")
 def set_obs_scene(data):
-    if data.get("scene_name"):
-        obs_manager.execute(lambda c: c.set_current_program_scene(data["scene_name"]))
+    return dispatcher.run_one({"type": "obs_scene", "params": data})
 
 @socketio.on("toggle_source_visibility", namespace="/dashboard")
 def toggle_source(data):
-    scene, source = data.get("scene_name"), data.get("source_name")
-    if scene and source:
-        def _toggle(c):
-            iid = c.get_scene_item_id(scene, source).scene_item_id
-            curr = c.get_scene_item_enabled(scene, iid).scene_item_enabled
-            c.set_scene_item_enabled(scene, iid, not curr)
-            return not curr
-        state = obs_manager.execute(_toggle)
-        emit("obs_status", {"connected": True, "message": f"{source}: {'ON' if state else 'OFF'}"}, namespace="/dashboard")
+    res = dispatcher.run_one({"type": "obs_source", "params": data})
+    if not res["ok"]: return
+    # Com vários OBS alvo (params.obs) vem um resultado por instância
+    result = res["result"]
+    for r in (result["instances"].values() if "instances" in result else [result]):
+        emit("obs_status", {"instance": r["instance"], "connected": True,
+                            "message": f"{r['source_name']}: {'ON' if r['enabled'] else 'OFF'}"}, namespace="/dashboard")
 
 @socketio.on("obs_set_mute", namespace="/dashboard")
 def obs_set_mute(data):
-    obs_manager.execute(lambda c: c.set_input_mute(data["input_name"], data["mute_state"]))
+    action = "obs_set_mute_on" if data.get("mute_state") else "obs_set_mute_off"
+    # Ack com o estado final (rajadas de cliques viram um só comando)
+    return dispatcher.run_one({"type": action, "params": data})
 
 @socketio.on("obs_stream_toggle", namespace="/dashboard")
-def obs_stream(): obs_manager.execute(lambda c: c.toggle_stream())
+def obs_stream(): dispatcher.run_one({"type": "obs_stream_toggle"})
 
 @socketio.on("obs_record_toggle", namespace="/dashboard")
-def obs_rec(): obs_manager.execute(lambda c: c.toggle_record())
+def obs_rec(): dispatcher.run_one({"type": "obs_record_toggle"})
+
+@socketio.on("stream_stats_subscribe", namespace="/dashboard")
+def stream_stats_subscribe():
+    uid = session.get('user_id')
+    if not uid: return
+    join_room(f"twitch:{uid}")
+    snapshot = stream_poller.subscribe(uid, session.get('access_token'), request.sid)
+    if snapshot: emit("stream_stats", snapshot)
 
 @socketio.on("vts_trigger_hotkey", namespace="/dashboard")
 def vts_hotkey(data):
-    vts_manager.trigger_hotkey(data.get("hotkey_id"))
+    dispatcher.run_one({"type": "vts_hotkey", "params": data})
+
+# Faders: mandam a posição a cada movimento, sem ack; o frame junta tudo
+@socketio.on("vts_param", namespace="/dashboard")
+def vts_param(data):
+    try:
+        vts_manager.params.set(data.get("parameter_id"), data.get("value", 0),
+                               duration=float(data.get("duration_ms") or 0) / 1000,
+                               curve=data.get("curve") or "linear", source=request.sid)
+    except (ValueError, TypeError, OverflowError) as e:
+        emit("vts_param_error", {"parameter_id": data.get("parameter_id"), "error": str(e)})
+
+@socketio.on("vts_param_release", namespace="/dashboard")
+def vts_param_release(data=None):
+    vts_manager.params.release(param_id=(data or {}).get("parameter_id"), source=request.sid)
 
 @socketio.on("play_sound", namespace="/dashboard")
 def play_sound(data):
-    path = os.path.join("sounds", secure_filename(data.get("file", "")))
-    if os.path.exists(path):
-        try: pygame.mixer.Sound(path).play()
-        except: pass
+    dispatcher.run_one({"type": "sound", "params": {"file_name": data.get("file", "")}})
 
 @socketio.on("run_hotkey", namespace="/dashboard")
 def run_hotkey(data):
-    try: keyboard.press_and_release(data.get("keys_str", ""))
-    except: pass
+    dispatcher.run_one({"type": "hotkey", "params": data})
+
+# --- Executores das Ações (usados por press_button e pelos eventos avulsos) ---
+
+@dispatcher.action("obs_scene")
+def action_obs_scene(params):
+    scene = params.get("scene_name")
+    if not scene: raise ValueError("Cena não informada")
+    # Trocas de cena em rajada: só a última vai ao OBS, e todas respondem com ela
+    def switch(manager):
+        final = manager.set_program_scene(scene)
+        return {"scene_name": final["value"], "merged": final["merged"]}
+    return obs_registry.fan_out(params.get("obs"), switch)
+
+@dispatcher.action("obs_source")
+def action_obs_source(params):
+    scene, source = params.get("scene_name"), params.get("source_name")
+    if not (scene and source): raise ValueError("Cena/fonte não informadas")
+    def toggle(manager):
+        enabled = manager.toggle_source(scene, source)
+        button_states.observe(instance_target(manager.name, ("scene_item", scene, source)), enabled)
+        return {"instance": manager.name, "source_name": source, "enabled": enabled}
+    return obs_registry.fan_out(params.get("obs"), toggle)
+
+@dispatcher.action("obs_set_mute_on")
+def action_obs_mute(params):
+    return obs_registry.fan_out(params.get("obs"), lambda m: set_mute(m, params["input_name"], True))
+
+@dispatcher.action("obs_set_mute_off")
+def action_obs_unmute(params):
+    return obs_registry.fan_out(params.get("obs"), lambda m: set_mute(m, params["input_name"], False))
+
+def set_mute(manager, input_name, muted):
+    """Mute com debounce por entrada; o retorno traz o estado que ficou valendo."""
+    final = manager.set_input_mute(input_name, muted)
+    button_states.observe(instance_target(manager.name, ("input_mute", input_name)), final["value"])
+    return {"input_name": input_name, "muted": final["value"], "merged": final["merged"]}
+
+@dispatcher.action("obs_stream_toggle")
+def action_obs_stream(params):
+    return obs_registry.fan_out(params.get("obs"), lambda m: toggle_output(m, "stream", lambda c: c.toggle_stream()))
+
+@dispatcher.action("obs_record_toggle")
+def action_obs_record(params):
+    return obs_registry.fan_out(params.get("obs"), lambda m: toggle_output(m, "record", lambda c: c.toggle_record()))
+
+def toggle_output(manager, kind, request_fn):
+    active = getattr(manager.call(request_fn), "output_active", None)
+    if active is not None: button_states.observe(instance_target(manager.name, (kind,)), active)
+    return {"active": active}
+
+# --- Ações que viram requisições diretas do OBS (agrupadas em lote pelo dispatcher) ---
+# O estado dos toggles volta pelos eventos do mirror. O lote vai só para o OBS
+# padrão; ações com params["obs"] apontando para outro seguem pelo executor.
+
+def default_only(builder):
+    @functools.wraps(builder)
+    def wrapper(params):
+        if params.get("obs") not in (None, "", DEFAULT_INSTANCE): return None
+        return builder(params)
+    return wrapper
+
+@dispatcher.batchable("obs_scene")
+@default_only
+def batch_obs_scene(params):
+    return [("SetCurrentProgramScene", {"sceneName": params["scene_name"]})]
+
+@dispatcher.batchable("obs_source")
+@default_only
+def batch_obs_source(params):
+    # Só entra no lote com id em cache e estado mantido pelos eventos do mirror
+    if not obs_manager.mirror.ready: return None
+    scene, source = params["scene_name"], params["source_name"]
+    item = obs_manager.scene_item(scene, source, fetch=False)
+    if not item: return None
+    return [("SetSceneItemEnabled", {"sceneName": scene, "sceneItemId": item["id"], "sceneItemEnabled": not item["enabled"]})]
+
+@dispatcher.batchable("obs_set_mute_on")
+@default_only
+def batch_obs_mute(params):
+    return [("SetInputMute", {"inputName": params["input_name"], "inputMuted": True})]
+
+@dispatcher.batchable("obs_set_mute_off")
+@default_only
+def batch_obs_unmute(params):
+    return [("SetInputMute", {"inputName": params["input_name"], "inputMuted": False})]
+
+@dispatcher.batchable("obs_stream_toggle")
+@default_only
+def batch_obs_stream(params):
+    return [("ToggleStream", None)]
+
+@dispatcher.batchable("obs_record_toggle")
+@default_only
+def batch_obs_record(params):
+    return [("ToggleRecord", None)]
+
+@dispatcher.action("vts_hotkey")
+def action_vts_hotkey(params):
+    if not vts_manager.is_connected:
+        # Não espera o backoff: o próximo aperto já encontra a conexão de volta
+        vts_manager.reconnect_now()
+        raise ConnectionError("VTS desconectado")
+    hotkey_id = params.get("hotkey_id")
+    if not hotkey_id: raise ValueError("Hotkey não informada")
+    # Espera a confirmação do VTS: erro de hotkey inexistente volta no ack
+    vts_manager.trigger_hotkey(hotkey_id)
+    return {"hotkey_id": hotkey_id}
+
+# Parâmetros vindos do deck/macros têm fonte própria: "Soltar Parâmetro" só solta esses
+DECK_PARAM_SOURCE = "deck"
+
+@dispatcher.action("vts_param")
+def action_vts_param(params):
+    hold_ms = params.get("hold_ms")
+    value = vts_manager.params.set(
+        params.get("parameter_id"), params.get("value") or 0,
+        duration=float(params.get("duration_ms") or 0) / 1000,
+        curve=params.get("curve") or "linear",
+        source=DECK_PARAM_SOURCE,
+        # Vazio = segura até uma ação "Soltar Parâmetro"
+        hold=float(hold_ms) / 1000 if hold_ms not in (None, "") else None
+    )
+    return {"parameter_id": params.get("parameter_id"), "value": value}
+
+@dispatcher.action("vts_param_release")
+def action_vts_param_release(params):
+    # Sem parâmetro: solta tudo que o deck/macros estão segurando
+    vts_manager.params.release(param_id=params.get("parameter_id") or None, source=DECK_PARAM_SOURCE)
+    return {"parameter_id": params.get("parameter_id") or None}
+
+@dispatcher.action("sound")
+def action_sound(params):
+    path = os.path.join("sounds", secure_filename(params.get("file_name", "")))
+    if not os.path.exists(path): raise FileNotFoundError(f"Som não encontrado: {params.get('file_name')}")
+    pygame.mixer.Sound(path).play()
+
+@dispatcher.action("hotkey")
+def action_hotkey(params):
+    keyboard.press_and_release(params.get("keys_str", ""))
+
+@dispatcher.action("open_deck")
+def action_open_deck(params):
+    # Navegação é local de cada painel; o servidor só informa o destino
+    return {"deck_id": params.get("deck_id") or "root"}
 
 if __name__ == "__main__":
     socketio.run(app, debug=True, port=5000, host='0.0.0.0')
\ No newline at end of file
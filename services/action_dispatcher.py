@@ -0,0 +1,171 @@
+import logging
+import threading
+import time
+
+from services.deck_store import deck_store
+from services.button_state import button_states
+from services.macro_engine import macro_engine, is_macro
+
+class ActionDispatcher:
+    """
+    Executa no servidor as ações de um botão do deck.
+    O painel manda só {deck_id, slot_id}; as ações saem do índice compilado
+    da config em memória e o resultado volta num único ack, com status e
+    tempo de cada ação.
+
+    Os executores de cada tipo de ação são registrados com @dispatcher.action("tipo").
+    Tipos que viram requisições simples do OBS também registram
+    @dispatcher.batchable("tipo"): várias ações seguidas desse jeito num mesmo
+    botão saem num único RequestBatch (uma ida e volta).
+    Listas com passos de tempo (wait/parallel) vão para o MacroEngine e o ack
+    só confirma o início (ou o cancelamento, se a macro já estava rodando).
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls, *args, **kwargs):
+        if not cls._instance:
+            with cls._lock:
+                if not cls._instance:
+                    cls._instance = super(ActionDispatcher, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if hasattr(self, 'initialized'): return
+        self.handlers = {}
+        self.builders = {}
+        self.batch_sender = None
+        self.logger = logging.getLogger("ActionDispatcher")
+        self.initialized = True
+
+    def action(self, action_type):
+        """Decorator: registra a função que executa um tipo de ação (recebe params)."""
+        def register(fn):
+            self.handlers[action_type] = fn
+            return fn
+        return register
+
+    def batchable(self, action_type):
+        """
+        Decorator: registra params -> [(requestType, requestData)] para o tipo.
+        Retornar None faz a ação seguir pelo executor normal.
+        """
+        def register(fn):
+            self.builders[action_type] = fn
+            return fn
+        return register
+
+    def configure(self, batch_sender=None):
+        """`batch_sender(requests)` -> resultados na mesma ordem (ObsManager.batch)."""
+        self.batch_sender = batch_sender
+
+    def press(self, deck_id, slot_id, turn_on=True):
+        """
+        Resolve as ações do slot na config em memória e executa.
+        Em botões toggle quem decide ON/OFF é o servidor (o `turn_on` do cliente é ignorado).
+        """
+        start = time.perf_counter()
+        index = deck_store.compiled()
+        button = index.button(deck_id, slot_id)
+        key = f"{deck_id}/{slot_id}"
+        if not button:
+            # Painel com config velha (botão apagado/movido): o ack mostra o erro
+            return {"deck_id": deck_id, "slot_id": slot_id, "turn_on": turn_on, "ok": False,
+                    "results": [], "error": "Botão não encontrado",
+                    "ms": round((time.perf_counter() - start) * 1000, 2)}
+
+        running = macro_engine.by_key.get(key)
+        if running is not None:
+            # Reapertar durante a macro só cancela: o toggle não inverte e a outra lista não roda
+            macro_engine.cancel(running)
+            if button.get("is_stateful"):
+                turn_on = button_states.states.get(key, False)
+            ack = {"deck_id": deck_id, "slot_id": slot_id, "turn_on": turn_on, "ok": True, "results": [],
+                   "macro": {"macro_id": running, "status": "cancelled"}}
+            ack["ms"] = round((time.perf_counter() - start) * 1000, 2)
+            return ack
+
+        if button.get("is_stateful"):
+            turn_on = button_states.press(deck_id, slot_id)
+        actions = index.actions(deck_id, slot_id, turn_on)
+        ack = {"deck_id": deck_id, "slot_id": slot_id, "turn_on": turn_on}
+
+        if is_macro(actions):
+            ack["macro"] = macro_engine.start(key, actions)
+            ack["ok"] = ack["macro"]["status"] != "rejected"
+            ack["results"] = []
+        else:
+            ack["results"] = self.run(actions)
+            ack["ok"] = all(r["ok"] for r in ack["results"])
+
+        ack["ms"] = round((time.perf_counter() - start) * 1000, 2)
+        return ack
+
+    def run(self, actions):
+        """Executa uma lista de ações em ordem; falha de uma não interrompe as demais."""
+        results, group = [], []
+        for action in actions:
+            requests = self._build(action)
+            if requests:
+                group.append((action, requests))
+                continue
+            results.extend(self._run_group(group))
+            group = []
+            results.append(self.run_one(action))
+        results.extend(self._run_group(group))
+        return results
+
+    def _build(self, action):
+        builder = self.builders.get(action.get("type"))
+        if not builder or not self.batch_sender: return None
+        try:
+            return builder(action.get("params") or {})
+        except Exception:
+            return None  # o executor normal reporta o erro
+
+    def _run_group(self, group):
+        """Ações seguidas que viram requisições: um lote só (ou run_one se for uma)."""
+        if len(group) < 2:
+            return [self.run_one(action) for action, _ in group]
+
+        start = time.perf_counter()
+        flat = [req for _, requests in group for req in requests]
+        try:
+            replies = self.batch_sender(flat)
+        except Exception as e:
+            self.logger.warning(f"Lote falhou: {e}")
+            replies = [{"ok": False, "error": str(e)}] * len(flat)
+        ms = round((time.perf_counter() - start) * 1000, 2)
+
+        results, pos = [], 0
+        for action, requests in group:
+            mine = replies[pos:pos + len(requests)]
+            pos += len(requests)
+            result = {"type": action.get("type"), "ok": all(r["ok"] for r in mine), "batched": True, "ms": ms}
+            errors = [r["error"] for r in mine if not r["ok"]]
+            if errors: result["error"] = "; ".join(errors)
+            results.append(result)
+        return results
+
+    def run_one(self, action):
+        action_type = action.get("type")
+        params = action.get("params") or {}
+        result = {"type": action_type, "ok": False}
+        start = time.perf_counter()
+
+        handler = self.handlers.get(action_type)
+        if not handler:
+            result["error"] = f"Ação desconhecida: {action_type}"
+        else:
+            try:
+                result["result"] = handler(params)
+                result["ok"] = True
+            except Exception as e:
+                self.logger.warning(f"Ação {action_type} falhou: {e}")
+                result["error"] = str(e)
+
+        result["ms"] = round((time.perf_counter() - start) * 1000, 2)
+        return result
+
+# Instância Global
+dispatcher = ActionDispatcher()
@@ -0,0 +1,23 @@
+import random
+
+class Backoff:
+    """
+    Espera exponencial com jitter para reconexões: base, 2x, 4x... até `cap`,
+    sorteando entre metade e o valor cheio para que vários clientes (ou
+    serviços) não tentem todos no mesmo instante.
+    """
+
+    def __init__(self, base=1.0, cap=30.0, factor=2.0):
+        self.base = base
+        self.cap = cap
+        self.factor = factor
+        self.attempts = 0
+
+    def next(self):
+        delay = min(self.cap, self.base * self.factor ** self.attempts)
+        # Chegou no teto: para de contar (o expoente estouraria após ~1000 tentativas)
+        if delay < self.cap: self.attempts += 1
+        return random.uniform(delay / 2, delay)
+
+    def reset(self):
+        self.attempts = 0
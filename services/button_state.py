@@ -0,0 +1,141 @@
+import logging
+import threading
+
+from services.deck_store import deck_store
+from services.obs_manager import DEFAULT_INSTANCE
+
+def instance_target(instance, target):
+    """Alvo de um OBS nomeado: ("input_mute@jogo", "Mic"). O padrão fica sem sufixo."""
+    if not instance or instance == DEFAULT_INSTANCE: return tuple(target)
+    return (f"{target[0]}@{instance}",) + tuple(target[1:])
+
+def split_target(target):
+    """Inverso de instance_target: (instância, alvo sem sufixo)."""
+    kind, _, instance = target[0].partition("@")
+    return instance or DEFAULT_INSTANCE, (kind,) + tuple(target[1:])
+
+def _first_instance(selector):
+    """OBS cujo estado um toggle segue quando a ação vai para vários (o 1º citado)."""
+    if isinstance(selector, (list, tuple)): selector = ",".join(selector)
+    if not selector or selector == "*": return None
+    return selector.split(",")[0].strip()
+
+def state_binding(button):
+    """
+    Estado real que um botão toggle espelha, deduzido da 1ª ação "ligar" reconhecida.
+    Retorna (alvo, invertido) ou None. Ex.: ("input_mute", "Mic") com
+    obs_set_mute_off em actions_on fica invertido (ON = desmutado).
+    """
+    for action in button.get("actions_on") or []:
+        action_type = action.get("type")
+        params = action.get("params") or {}
+        binding = None
+        if action_type == "obs_source" and params.get("scene_name") and params.get("source_name"):
+            binding = ("scene_item", params["scene_name"], params["source_name"]), False
+        elif action_type in ("obs_set_mute_on", "obs_set_mute_off") and params.get("input_name"):
+            binding = ("input_mute", params["input_name"]), action_type == "obs_set_mute_off"
+        elif action_type == "obs_stream_toggle":
+            binding = ("stream",), False
+        elif action_type == "obs_record_toggle":
+            binding = ("record",), False
+        if binding:
+            target, inverted = binding
+            return instance_target(_first_instance(params.get("obs")), target), inverted
+    return None
+
+class ButtonStateStore:
+    """
+    Estado ON/OFF dos botões is_stateful, mantido pelo servidor para que todos
+    os painéis concordem. Quando o botão controla algo do OBS (fonte visível,
+    entrada mutada, live/gravação), o estado segue o valor real informado por
+    observe() em vez do palpite de quem apertou.
+
+    Chaves no formato "deck_id/slot_id". Mudanças saem em lote pelo callback("CHANGED", {chave: bool}).
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls, *args, **kwargs):
+        if not cls._instance:
+            with cls._lock:
+                if not cls._instance:
+                    cls._instance = super(ButtonStateStore, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if hasattr(self, 'initialized'): return
+        self.states = {}
+        self.targets = {}        # alvo -> valor real conhecido
+        self.callback = None
+        self._bindings = {}      # alvo -> [(chave, invertido)]
+        self._stateful = set()
+        self._bindings_version = None
+        self.logger = logging.getLogger("ButtonStateStore")
+        self.initialized = True
+
+    def configure(self, callback=None):
+        self.callback = callback
+
+    def _notify(self, event_type, data):
+        if self.callback and data:
+            self.callback(event_type, data)
+
+    def _refresh_bindings(self):
+        """Recalcula quais botões espelham quais alvos (uma vez por versão da config)."""
+        index = deck_store.compiled()
+        if self._bindings_version == index.version: return
+        self._bindings_version = index.version
+
+        bindings, stateful = {}, set()
+        for (deck_id, slot_id), button in index.slots.items():
+            if not button.get("is_stateful"): continue
+            key = f"{deck_id}/{slot_id}"
+            stateful.add(key)
+            binding = state_binding(button)
+            if binding:
+                target, inverted = binding
+                bindings.setdefault(target, []).append((key, inverted))
+        self._bindings, self._stateful = bindings, stateful
+
+        # Botões removidos ou que deixaram de ser toggle saem do estado
+        for key in [k for k in self.states if k not in stateful]:
+            del self.states[key]
+        # Botões novos ligados a algo já conhecido começam com o valor real
+        changed = {}
+        for target, value in self.targets.items():
+            changed.update(self._apply_target(target, value))
+        self._notify("CHANGED", changed)
+
+    def snapshot(self):
+        self._refresh_bindings()
+        return dict(self.states)
+
+    def bound_targets(self):
+        self._refresh_bindings()
+        return list(self._bindings)
+
+    def press(self, deck_id, slot_id):
+        """Inverte o estado do botão e retorna o novo valor (True = executar actions_on)."""
+        self._refresh_bindings()
+        key = f"{deck_id}/{slot_id}"
+        new_state = not self.states.get(key, False)
+        self.states[key] = new_state
+        self._notify("CHANGED", {key: new_state})
+        return new_state
+
+    def observe(self, target, value):
+        """Valor real de um alvo (vindo do OBS): atualiza todos os botões ligados a ele."""
+        self.targets[target] = value
+        self._refresh_bindings()
+        self._notify("CHANGED", self._apply_target(target, value))
+
+    def _apply_target(self, target, value):
+        changed = {}
+        for key, inverted in self._bindings.get(target, []):
+            state = (not value) if inverted else bool(value)
+            if self.states.get(key) != state:
+                self.states[key] = changed[key] = state
+        return changed
+
+# Instância Global
+button_states = ButtonStateStore()
@@ -0,0 +1,52 @@
+import eventlet
+from eventlet.event import Event
+
+class Coalescer:
+    """
+    "Último valor vence" por chave, com janela de debounce.
+
+    Com a chave livre, o submit aplica na hora (sem esperar a janela). Depois
+    de cada `apply` a chave fica ocupada por `window` segundos; os pedidos que
+    chegam enquanto o comando está em andamento ou dentro da janela só trocam
+    o valor desejado e, ao fim dela, `apply(valor)` roda uma vez com o mais
+    recente. Todos os que pediram juntos recebem o mesmo desfecho:
+    {"value": valor aplicado, "merged": quantos pedidos viraram este}.
+    """
+
+    def __init__(self, window=0.12):
+        self.window = window
+        self.busy = {}   # chave -> próximo pedido {"value", "apply", "merged", "done"} ou None
+
+    def submit(self, key, value, apply):
+        if key in self.busy:
+            entry = self.busy[key]
+            if entry:
+                entry["value"], entry["apply"] = value, apply
+                entry["merged"] += 1
+            else:
+                entry = self.busy[key] = {"value": value, "apply": apply, "merged": 1, "done": Event()}
+            return entry["done"].wait()
+
+        # Chave livre: aplica já, nesta green thread
+        entry = {"value": value, "apply": apply, "merged": 1, "done": Event()}
+        self.busy[key] = None
+        self._apply(key, entry)
+        return entry["done"].wait()
+
+    def _apply(self, key, entry):
+        try:
+            entry["apply"](entry["value"])
+        except Exception as e:
+            entry["done"].send_exception(e)
+        else:
+            entry["done"].send({"value": entry["value"], "merged": entry["merged"]})
+        eventlet.spawn_after(self.window, self._flush, key)
+
+    def _flush(self, key):
+        """Fim da janela: aplica o que chegou nela ou libera a chave."""
+        entry = self.busy.get(key)
+        if entry is None:
+            self.busy.pop(key, None)
+            return
+        self.busy[key] = None
+        self._apply(key, entry)
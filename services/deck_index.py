@@ -0,0 +1,262 @@
+from bisect import bisect_left
+from collections import deque
+import copy
+import re
+import unicodedata
+
+# Campos de params que apontam para algo externo, por tipo de referência
+REF_FIELDS = {
+    "scene": ("scene_name",),
+    "source": ("source_name",),
+    "input": ("input_name",),
+    "sound": ("file_name",),
+    "vts_hotkey": ("hotkey_id",),
+    "deck": ("deck_id",),
+}
+
+def tokenize(text):
+    """Palavras minúsculas e sem acento ("Câmera 2" -> ["camera", "2"])."""
+    text = unicodedata.normalize("NFKD", str(text)).encode("ascii", "ignore").decode("ascii")
+    return re.findall(r"\w+", text.lower())
+
+# Tipo de ação -> tipos de referência que ela usa
+ACTION_REFS = {
+    "obs_scene": ("scene",),
+    "obs_source": ("scene", "source"),
+    "obs_set_mute_on": ("input",),
+    "obs_set_mute_off": ("input",),
+    "sound": ("sound",),
+    "vts_hotkey": ("vts_hotkey",),
+    "open_deck": ("deck",),
+}
+
+def thumbnail_source(button):
+    """Fonte (ou cena) que um botão controla, para mostrar como miniatura."""
+    for action in button.get("actions_on") or []:
+        params = action.get("params") or {}
+        if action.get("type") == "obs_source" and params.get("source_name"):
+            return params["source_name"]
+        if action.get("type") == "obs_scene" and params.get("scene_name"):
+            return params["scene_name"]
+    return None
+
+class DeckIndex:
+    """
+    Versão compilada (somente leitura) da árvore de decks.
+    Montada uma vez por versão da config pelo DeckStore, evita re-percorrer
+    o dict cru a cada clique, validação ou busca.
+
+    - slots: (deck_id, slot_id) -> botão
+    - folders: grafo de pastas formado pelas ações open_deck
+    - refs: tipo -> valor -> lista de usos (cenas, fontes, entradas, sons, hotkeys VTS, pastas)
+    - terms: índice invertido palavra -> slots (rótulo, tipo de ação e alvos) para a busca
+    """
+
+    def __init__(self, config, version=0):
+        self.version = version
+        self.start_deck = config.get("settings", {}).get("start_deck", "root")
+        self.decks = config.get("decks", {})
+
+        self.slots = {}
+        self.folders = {deck_id: set() for deck_id in self.decks}
+        self.refs = {kind: {} for kind in REF_FIELDS}
+        self.terms = {}
+        self._vocab = None
+        self._deck_refs = {}
+
+        for deck_id, buttons in self.decks.items():
+            for slot_id, button in (buttons or {}).items():
+                if not button: continue
+                self.slots[(deck_id, slot_id)] = button
+                self._index_text((deck_id, slot_id), button.get("label"))
+                for list_name in ("actions_on", "actions_off"):
+                    for pos, action in enumerate(button.get(list_name) or []):
+                        self._index_action(deck_id, slot_id, list_name, pos, action)
+
+        self._build_tree()
+        self.orphans = sorted(d for d in self.decks if d not in self.parent)
+        self.missing_decks = sorted(d for d in self.refs["deck"] if d not in self.decks)
+        self.cycles = self._find_cycles()
+
+    def _index_action(self, deck_id, slot_id, list_name, pos, action):
+        action_type = action.get("type")
+        params = action.get("params") or {}
+        use = {"deck_id": deck_id, "slot_id": slot_id, "list": list_name, "index": pos, "type": action_type}
+
+        slot_key = (deck_id, slot_id)
+        if action_type: self.terms.setdefault(action_type.lower(), set()).add(slot_key)
+        for kind in ACTION_REFS.get(action_type, ()):
+            for field in REF_FIELDS[kind]:
+                value = params.get(field)
+                if value:
+                    self.refs[kind].setdefault(value, []).append(use)
+                    self._index_text(slot_key, value)
+        if action_type == "hotkey":
+            self._index_text(slot_key, params.get("keys_str"))
+
+        if action_type == "open_deck":
+            target = params.get("deck_id") or "root"
+            self.folders[deck_id].add(target)
+
+    def _index_text(self, slot_key, text):
+        if not text: return
+        for token in tokenize(text):
+            self.terms.setdefault(token, set()).add(slot_key)
+
+    # --- Consultas ---
+
+    def button(self, deck_id, slot_id):
+        return self.slots.get((deck_id, slot_id))
+
+    def actions(self, deck_id, slot_id, turn_on=True):
+        """Lista de ações a executar para um slot (actions_on ou actions_off)."""
+        button = self.slots.get((deck_id, slot_id))
+        if not button: return []
+        return button.get("actions_on" if turn_on else "actions_off") or []
+
+    def uses(self, kind, value):
+        """Onde um valor (ex.: nome de cena) é referenciado."""
+        return self.refs.get(kind, {}).get(value, [])
+
+    def deck_refs(self, deck_id, kind):
+        """Valores de um tipo de referência usados pelos botões de uma pasta (ordenados)."""
+        key = (deck_id, kind)
+        if key not in self._deck_refs:
+            self._deck_refs[key] = sorted(
+                value for value, uses in self.refs.get(kind, {}).items()
+                if any(u["deck_id"] == deck_id for u in uses)
+            )
+        return self._deck_refs[key]
+
+    def deck_thumbnails(self, deck_id, icon):
+        """Cenas/fontes cujos botões desta pasta usam `icon` como ícone (miniatura ao vivo)."""
+        key = (deck_id, "thumbnail")
+        if key not in self._deck_refs:
+            sources = set()
+            for (slot_deck, _), button in self.slots.items():
+                if slot_deck == deck_id and button.get("icon") == icon:
+                    source = thumbnail_source(button)
+                    if source: sources.add(source)
+            self._deck_refs[key] = sorted(sources)
+        return self._deck_refs[key]
+
+    def search(self, query="", action_type=None, limit=50):
+        """
+        Busca por palavras (prefixo, todas precisam bater) em rótulos, tipos de
+        ação e alvos; `action_type` filtra por tipo exato. Retorna slots ordenados.
+        """
+        if self._vocab is None: self._vocab = sorted(self.terms)
+        found = None
+        for term in tokenize(query):
+            matches = set()
+            pos = bisect_left(self._vocab, term)
+            while pos < len(self._vocab) and self._vocab[pos].startswith(term):
+                matches |= self.terms[self._vocab[pos]]
+                pos += 1
+            found = matches if found is None else found & matches
+            if not found: break
+
+        if action_type:
+            typed = self.terms.get(action_type.lower(), set())
+            found = typed if found is None else found & typed
+        if found is None: found = set()
+
+        results = []
+        for deck_id, slot_id in sorted(found)[:limit]:
+            button = self.slots[(deck_id, slot_id)]
+            results.append({
+                "deck_id": deck_id, "slot_id": slot_id, "label": button.get("label"),
+                "types": sorted({a.get("type") for a in (button.get("actions_on") or []) + (button.get("actions_off") or [])} - {None})
+            })
+        return {"version": self.version, "total": len(found), "results": results}
+
+    def rewrite_buttons(self, kind, old, new, scene=None):
+        """
+        Cópias editadas dos botões que referenciam `old`, agora apontando para `new`
+        (ex.: cena renomeada no OBS). `scene` restringe a troca de fontes a uma cena.
+        Retorna [(deck_id, slot_id, botão)].
+        """
+        edited = {}
+        for use in self.uses(kind, old):
+            key = (use["deck_id"], use["slot_id"])
+            if key not in edited: edited[key] = copy.deepcopy(self.slots[key])
+            params = edited[key][use["list"]][use["index"]].setdefault("params", {})
+            if scene is not None and params.get("scene_name") != scene: continue
+            for field in REF_FIELDS[kind]:
+                if params.get(field) == old: params[field] = new
+
+        return [
+            (deck_id, slot_id, button)
+            for (deck_id, slot_id), button in sorted(edited.items())
+            if button != self.slots[(deck_id, slot_id)]
+        ]
+
+    def validate(self, known=None):
+        """
+        Problemas da árvore. `known` opcional: tipo -> conjunto de valores que
+        existem de fato (cenas do OBS, arquivos de som, hotkeys do VTS...).
+        Tipos ausentes em `known` não são checados.
+        """
+        known = known or {}
+        unknown = {}
+        for kind, values in known.items():
+            if values is None or kind == "deck": continue
+            missing = {v: self.refs[kind][v] for v in self.refs.get(kind, {}) if v not in values}
+            if missing: unknown[kind] = missing
+
+        return {
+            "version": self.version,
+            "orphan_decks": self.orphans,
+            "missing_decks": {d: self.refs["deck"][d] for d in self.missing_decks},
+            "cycles": self.cycles,
+            "unknown_refs": unknown,
+        }
+
+    # --- Grafo de pastas ---
+
+    def _build_tree(self):
+        """BFS a partir da pasta inicial: caminho mais curto até cada pasta."""
+        self.parent = {}
+        if self.start_deck not in self.decks: return
+        self.parent[self.start_deck] = None
+        queue = deque([self.start_deck])
+        while queue:
+            deck_id = queue.popleft()
+            for target in sorted(self.folders.get(deck_id, ())):
+                if target in self.decks and target not in self.parent:
+                    self.parent[target] = deck_id
+                    queue.append(target)
+
+    def _is_ancestor(self, ancestor, deck_id):
+        while deck_id is not None:
+            if deck_id == ancestor: return True
+            deck_id = self.parent.get(deck_id)
+        return False
+
+    def _find_cycles(self):
+        """
+        Ciclos entre pastas que NÃO são navegação para cima.
+        Botões "Voltar"/"Início" apontam para um ancestral na árvore e são
+        esperados; os que sobram (ex.: duas pastas irmãs que se abrem
+        mutuamente) formam laços sem saída natural.
+        """
+        edges = {
+            deck_id: sorted(t for t in targets if t in self.decks and not self._is_ancestor(t, deck_id))
+            for deck_id, targets in self.folders.items()
+        }
+        cycles, state, stack = [], {}, []
+
+        def visit(deck_id):
+            state[deck_id] = "open"
+            stack.append(deck_id)
+            for target in edges.get(deck_id, ()):
+                if state.get(target) == "open":
+                    cycles.append(stack[stack.index(target):] + [target])
+                elif target not in state:
+                    visit(target)
+            stack.pop()
+            state[deck_id] = "done"
+
+        for deck_id in sorted(edges):
+            if deck_id not in state: visit(deck_id)
+        return cycles
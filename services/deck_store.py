@@ -0,0 +1,364 @@
+import eventlet
+from eventlet import event, queue
+import json
+import logging
+import os
+import threading
+import time
+import atexit
+import uuid
+import hashlib
+
+from services.deck_index import DeckIndex
+
+class DeckStore:
+    """
+    Mantém a árvore de decks (deck_config.json) em memória.
+    Leituras não tocam o disco. Cada edição vira um registro pequeno num
+    journal append-only (deck_config.json.journal); a compactação roda em
+    background e grava um snapshot atômico (arquivo temporário + rename).
+
+    Toda alteração incrementa `version` e gera um patch (lista de ops) que
+    pode ser enviado aos painéis no lugar da config inteira. `epoch` muda a
+    cada boot do servidor, para o cliente saber que a numeração recomeçou.
+
+    Edições passam por uma fila com um único writer (green thread). Cada uma
+    pode informar a versão em que se baseou; se alguma pasta tocada mudou
+    depois disso, é rejeitada com DeckConflictError em vez de sobrescrever.
+    O próprio writer publica cada patch (callback("PATCH", patch)), então os
+    painéis recebem as versões na ordem em que foram gravadas.
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls, *args, **kwargs):
+        if not cls._instance:
+            with cls._lock:
+                if not cls._instance:
+                    cls._instance = super(DeckStore, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if hasattr(self, 'initialized'): return
+        self.path = "deck_config.json"
+        self.journal_path = "deck_config.json.journal"
+        self.flush_delay = 0.5
+        self.stat_interval = 1.0
+        self.journal_max_bytes = 256 * 1024
+
+        self.config = None
+        self._signature = None   # (mtime_ns, size) do arquivo que temos em memória
+        self._last_stat = 0
+        self._dirty = False          # journal com registros ainda não compactados
+        self._journal_size = 0
+        self._flush_timer = None
+        self._mutex = threading.RLock()
+
+        self.version = 0
+        self.epoch = uuid.uuid4().hex[:8]
+        self._etags = {}   # deck_id -> ETag forte do conteúdo (calculado sob demanda)
+        self._deck_versions = {}   # deck_id -> versão da última alteração
+        self._compiled = None      # DeckIndex da versão atual (montado sob demanda)
+        self._queue = queue.Queue()
+        self._writer = None
+        self.callback = None
+
+        self.logger = logging.getLogger("DeckStore")
+        self.initialized = True
+        atexit.register(self.flush)
+
+    def configure(self, path, flush_delay=0.5, stat_interval=1.0, callback=None):
+        self.path = path
+        self.callback = callback
+        self.journal_path = path + ".journal"
+        self.flush_delay = flush_delay
+        self.stat_interval = stat_interval
+        with self._mutex:
+            self.config = None
+            self._signature = None
+
+    # --- Leitura ---
+
+    def get(self):
+        """
+        Retorna a config em memória (NÃO modificar o objeto retornado).
+        Recarrega do disco apenas se o arquivo mudou por fora (mtime/tamanho).
+        """
+        with self._mutex:
+            if self.config is None:
+                self._load()
+            else:
+                self._check_disk()
+            return self.config
+
+    def get_versioned(self):
+        """Config + versão atual, no formato servido em /api/deck_config."""
+        with self._mutex:
+            return dict(self.get(), version=self.version, epoch=self.epoch)
+
+    def get_deck(self, deck_id):
+        """Botões de um deck (NÃO modificar) ou None se ele não existe."""
+        return self.get()["decks"].get(deck_id)
+
+    def compiled(self):
+        """Índice compilado (DeckIndex) da versão atual; recompila só quando a config muda."""
+        with self._mutex:
+            config = self.get()
+            if self._compiled is None or self._compiled.version != self.version:
+                self._compiled = DeckIndex(config, self.version)
+            return self._compiled
+
+    def deck_etag(self, deck_id):
+        with self._mutex:
+            deck = self.get_deck(deck_id)
+            if deck is None: return None
+            etag = self._etags.get(deck_id)
+            if etag is None:
+                raw = json.dumps(deck, sort_keys=True, separators=(',', ':')).encode('utf-8')
+                etag = self._etags[deck_id] = hashlib.sha1(raw).hexdigest()
+            return etag
+
+    def get_index(self):
+        """Lista de decks com seus ETags: o cliente baixa só as pastas que abrir."""
+        with self._mutex:
+            config = self.get()
+            return {
+                "decks": {deck_id: self.deck_etag(deck_id) for deck_id in config["decks"]},
+                "settings": config.get("settings", {}),
+                "version": self.version,
+                "epoch": self.epoch
+            }
+
+    def index_etag(self):
+        # Qualquer alteração incrementa a versão, então ela basta como validador
+        with self._mutex:
+            self.get()
+            return f"{self.epoch}-{self.version}"
+
+    def _default_config(self):
+        return {"decks": {"root": {}}, "settings": {"start_deck": "root"}}
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def _check_disk(self):
+        now = time.monotonic()
+        if now - self._last_stat < self.stat_interval: return
+        self._last_stat = now
+        if self._stat() != self._signature:
+            self.logger.info("deck_config.json alterado externamente. Recarregando...")
+            self.version += 1
+            self._load()
+            self._notify("RELOADED", self.get_index())
+
+    def _notify(self, event_type, data):
+        if self.callback:
+            self.callback(event_type, data)
+
+    def _load(self):
+        """Carrega o snapshot e reaplica o journal por cima."""
+        self._last_stat = time.monotonic()
+        config = None
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    config = json.load(f)
+            except Exception as e:
+                # Não sobrescreve o arquivo ruim: guarda uma cópia para recuperação manual
+                backup = f"{self.path}.corrupt-{int(time.time())}"
+                self.logger.error(f"deck_config.json corrompido ({e}). Cópia salva em {backup}")
+                try: os.replace(self.path, backup)
+                except OSError: pass
+        if config is None:
+            config = self.config if self.config is not None else self._default_config()
+        if "decks" not in config: config["decks"] = {"root": {}}
+        self.config = config
+        self._etags = {}
+        self._compiled = None
+        # Sem histórico do que mudou: toda pasta passa a valer a partir desta versão
+        self._deck_versions = dict.fromkeys(config["decks"], self.version)
+
+        replayed = self._replay_journal()
+        self._signature = self._stat()
+        if replayed:
+            self.logger.info(f"{replayed} edições recuperadas do journal.")
+            self._mark_dirty()
+        elif not os.path.exists(self.path):
+            self._write_snapshot()
+
+    def _replay_journal(self):
+        if not os.path.exists(self.journal_path): return 0
+        count, valid_bytes = 0, 0
+        with open(self.journal_path, 'rb') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break # Registro incompleto (queda no meio da escrita): descarta o resto
+                for op in record.get("ops", [record]):
+                    self._apply(op)
+                count += 1
+                valid_bytes += len(line)
+        if valid_bytes != os.path.getsize(self.journal_path):
+            self.logger.warning("Journal com final truncado. Descartando registro incompleto.")
+            with open(self.journal_path, 'r+b') as f: f.truncate(valid_bytes)
+        self._journal_size = valid_bytes
+        return count
+
+    # --- Escrita ---
+
+    def submit(self, ops, base_version=None, base_epoch=None):
+        """
+        Enfileira as ops para o writer e espera o resultado (só esta green thread bloqueia).
+        Retorna o patch publicado, {} se nada mudou ou None se não conseguiu gravar.
+        Levanta DeckConflictError se a edição foi feita sobre uma versão velha.
+        """
+        if self._writer is None or self._writer.dead:
+            self._writer = eventlet.spawn(self._writer_loop)
+        done = event.Event()
+        self._queue.put((ops, base_version, base_epoch, done))
+        return done.wait()
+
+    def _writer_loop(self):
+        while True:
+            ops, base_version, base_epoch, done = self._queue.get()
+            try:
+                patch = self._commit(ops, base_version, base_epoch)
+            except Exception as e:
+                done.send_exception(e)
+                continue
+            if patch:
+                try:
+                    self._notify("PATCH", patch)
+                except Exception as e:
+                    self.logger.error(f"Erro ao publicar patch do deck: {e}")
+            done.send(patch)
+
+    def _commit(self, ops, base_version, base_epoch):
+        """
+        Aplica uma lista de ops como uma única versão (roda só no writer).
+        Grava o registro no journal antes de aplicar em memória.
+        """
+        with self._mutex:
+            decks = self.get()["decks"]
+            if base_version is not None:
+                stale = base_epoch is not None and base_epoch != self.epoch
+                stale = stale or any(
+                    self._deck_versions.get(op["deck"], 0) > base_version
+                    for op in ops if op["op"] != "ensure_deck"
+                )
+                if stale: raise DeckConflictError(self.version)
+
+            # Descarta o que não teria efeito (slot já removido, pasta já existente)
+            ops = [op for op in ops if not (
+                (op["op"] == "delete_button" and op["slot"] not in decks.get(op["deck"], {})) or
+                (op["op"] == "ensure_deck" and op["deck"] in decks)
+            )]
+            if not ops: return {}
+
+            if not self._append_journal({"ops": ops}): return None
+            self.version += 1
+            for op in ops:
+                self._apply(op)
+                self._deck_versions[op["deck"]] = self.version
+            self._mark_dirty()
+            etags = {op["deck"]: self.deck_etag(op["deck"]) for op in ops}
+            return {"epoch": self.epoch, "version": self.version, "ops": ops, "etags": etags}
+
+    def _apply(self, op):
+        decks = self.config["decks"]
+        self._etags.pop(op["deck"], None)
+        kind = op.get("op")
+        if kind == "set_button":
+            decks.setdefault(op["deck"], {})[op["slot"]] = op["button"]
+        elif kind == "delete_button":
+            decks.get(op["deck"], {}).pop(op["slot"], None)
+        elif kind == "set_deck":
+            decks[op["deck"]] = op["buttons"]
+        elif kind == "ensure_deck":
+            decks.setdefault(op["deck"], op["buttons"])
+
+    def _append_journal(self, record):
+        line = (json.dumps(record, separators=(',', ':')) + "\n").encode('utf-8')
+        try:
+            with open(self.journal_path, 'ab') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self._journal_size += len(line)
+            return True
+        except Exception as e:
+            self.logger.error(f"Erro ao gravar journal do deck: {e}")
+            return False
+
+    def _mark_dirty(self):
+        self._dirty = True
+        if self._journal_size >= self.journal_max_bytes:
+            # Journal grande demais: compacta logo, sem esperar a janela
+            if self._flush_timer is not None: self._flush_timer.cancel()
+            self._flush_timer = eventlet.spawn(self.flush)
+        elif self._flush_timer is None:
+            self._flush_timer = eventlet.spawn_after(self.flush_delay, self.flush)
+
+    def flush(self):
+        """Compacta: grava snapshot atômico e zera o journal."""
+        with self._mutex:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if not self._dirty: return True
+            if not self._write_snapshot():
+                # Tenta de novo na próxima janela (as edições continuam seguras no journal)
+                self._flush_timer = eventlet.spawn_after(self.flush_delay, self.flush)
+                return False
+            try:
+                with open(self.journal_path, 'wb'): pass
+                self._journal_size = 0
+            except OSError as e:
+                # Replay é idempotente: registros já compactados podem ser reaplicados sem efeito
+                self.logger.warning(f"Não foi possível limpar o journal: {e}")
+            self._dirty = False
+            return True
+
+    def _write_snapshot(self):
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.config, f, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            self._signature = self._stat()
+            return True
+        except Exception as e:
+            self.logger.error(f"Erro ao salvar deck: {e}")
+            return False
+
+class DeckConflictError(Exception):
+    """Edição baseada numa versão que outro painel já alterou."""
+
+    def __init__(self, current_version):
+        super().__init__(f"Config alterada por outro painel (versão atual: {current_version})")
+        self.current_version = current_version
+
+# --- Construtores de ops (formato do journal e dos patches) ---
+
+def set_button_op(deck_id, slot_id, button):
+    return {"op": "set_button", "deck": deck_id, "slot": slot_id, "button": button}
+
+def delete_button_op(deck_id, slot_id):
+    return {"op": "delete_button", "deck": deck_id, "slot": slot_id}
+
+def set_deck_op(deck_id, buttons):
+    return {"op": "set_deck", "deck": deck_id, "buttons": buttons}
+
+def ensure_deck_op(deck_id, buttons):
+    """Cria a pasta só se ela ainda não existir."""
+    return {"op": "ensure_deck", "deck": deck_id, "buttons": buttons}
+
+# Instância Global
+deck_store = DeckStore()
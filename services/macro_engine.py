@@ -0,0 +1,134 @@
+import eventlet
+from greenlet import GreenletExit
+import itertools
+import logging
+import threading
+import time
+
+# Passos com tempo: uma lista de ações que tenha algum destes vira macro
+TIMED_STEPS = ("wait", "parallel")
+
+def is_macro(actions):
+    return any(a.get("type") in TIMED_STEPS for a in actions or [])
+
+class MacroEngine:
+    """
+    Executa sequências de ações com esperas e ramos paralelos em green threads
+    (eventlet), sem uma thread de SO por macro.
+
+    Passos:
+      {"type": "wait", "params": {"ms": 300}}
+      {"type": "parallel", "params": {"branches": [[...ações...], [...ações...]]}}
+      qualquer outra ação -> executada pelo `runner` (ActionDispatcher.run_one)
+
+    Uma macro por botão (`by_key`): quem cancela ao reapertar é o ActionDispatcher.
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls, *args, **kwargs):
+        if not cls._instance:
+            with cls._lock:
+                if not cls._instance:
+                    cls._instance = super(MacroEngine, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if hasattr(self, 'initialized'): return
+        self.runner = None
+        self.callback = None
+        self.max_running = 500
+        self.running = {}   # macro_id -> dict de status (com a green thread em "_thread")
+        self.by_key = {}    # "deck/slot" -> macro_id
+        self._ids = itertools.count(1)
+        self.logger = logging.getLogger("MacroEngine")
+        self.initialized = True
+
+    def configure(self, runner, callback=None, max_running=500):
+        self.runner = runner
+        self.callback = callback
+        self.max_running = max_running
+
+    def _notify(self, event_type, data):
+        if self.callback:
+            self.callback(event_type, data)
+
+    # --- Controle ---
+
+    def start(self, key, actions):
+        if len(self.running) >= self.max_running:
+            return {"macro_id": None, "status": "rejected", "error": "Limite de macros simultâneas atingido"}
+
+        macro_id = next(self._ids)
+        info = {"macro_id": macro_id, "key": key, "steps": len(actions), "step": 0, "started_at": time.time()}
+        self.running[macro_id] = info
+        self.by_key[key] = macro_id
+        info["_thread"] = eventlet.spawn(self._run, info, actions)
+        self._notify("STARTED", self._public(info))
+        return {"macro_id": macro_id, "status": "started"}
+
+    def cancel(self, macro_id):
+        info = self.running.get(macro_id)
+        if not info: return False
+        # kill() levanta GreenletExit no ponto em que a macro está esperando
+        info["_thread"].kill()
+        if macro_id in self.running:
+            # Ainda não tinha começado: _run nunca vai rodar para fazer a limpeza
+            self._finish(info, "CANCELLED", [], time.perf_counter())
+        return True
+
+    def status(self):
+        return [self._public(info) for info in self.running.values()]
+
+    def _public(self, info):
+        return {k: v for k, v in info.items() if not k.startswith("_")}
+
+    # --- Execução ---
+
+    def _run(self, info, actions):
+        start = time.perf_counter()
+        results = []
+        outcome = "FINISHED"
+        try:
+            self._run_steps(actions, results, info)
+        except GreenletExit:
+            outcome = "CANCELLED"
+        except Exception as e:
+            self.logger.warning(f"Macro {info['macro_id']} falhou: {e}")
+            outcome = "FAILED"
+        finally:
+            self._finish(info, outcome, results, start)
+
+    def _finish(self, info, outcome, results, start):
+        self.running.pop(info["macro_id"], None)
+        if self.by_key.get(info["key"]) == info["macro_id"]:
+            del self.by_key[info["key"]]
+        data = self._public(info)
+        data.update(results=results, ms=round((time.perf_counter() - start) * 1000, 2))
+        self._notify(outcome, data)
+
+    def _run_steps(self, steps, results, info=None):
+        for pos, step in enumerate(steps):
+            if info is not None: info["step"] = pos
+            step_type = step.get("type")
+            params = step.get("params") or {}
+
+            if step_type == "wait":
+                eventlet.sleep(max(0.0, float(params.get("ms") or 0)) / 1000)
+            elif step_type == "parallel":
+                self._run_parallel(params.get("branches") or [], results)
+            else:
+                results.append(self.runner(step))
+
+    def _run_parallel(self, branches, results):
+        threads = [eventlet.spawn(self._run_steps, branch, results) for branch in branches]
+        try:
+            for thread in threads:
+                thread.wait()
+        finally:
+            # Cancelamento (ou erro) da macro derruba os ramos ainda ativos
+            for thread in threads:
+                thread.kill()
+
+# Instância Global
+macro_engine = MacroEngine()
@@ -1,101 +1,458 @@
+import eventlet
+from eventlet.event import Event
+from eventlet.queue import LightQueue, Empty
 import obsws_python as obs
+import json
 import logging
 import threading
+import uuid
+from obsws_python.error import OBSSDKRequestError, OBSSDKTimeoutError
+from websocket import WebSocketTimeoutException
+
+from services.backoff import Backoff
+from services.coalescer import Coalescer
+from services.obs_meters import ObsMeterStream
+from services.obs_state import ObsStateMirror
+from services.obs_thumbnails import ObsThumbnailService
+from services.obs_worker import ObsCommandWorker
+
+# RequestBatchExecutionType do obs-websocket v5
+BATCH_SERIAL = 0      # SerialRealtime: uma depois da outra, na ordem
+BATCH_PARALLEL = 2    # Parallel: todas ao mesmo tempo (sem ordem garantida)
+
+# Nome da conexão usada quando a ação não diz qual OBS
+DEFAULT_INSTANCE = "default"
+
+# A obsws_python loga traceback completo (ERROR) a cada conexão recusada; quem
+# reporta as falhas é o supervisor, uma vez por erro novo
+logging.getLogger("obsws_python").setLevel(logging.CRITICAL)
 
 class ObsManager:
-    _instance = None
-    _lock = threading.Lock()
+    """
+    Conexão com o OBS. Um supervisor (start()) é dono da conexão: conecta,
+    reconecta sozinho com backoff quando ela cai e avisa o callback só nas
+    transições ("STATUS" {connected, message}). Quem pede conexão enquanto
+    uma tentativa está em andamento espera por ela em vez de abrir outra.
 
-    def __new__(cls, *args, **kwargs):
-        if not cls._instance:
-            with cls._lock:
-                if not cls._instance:
-                    cls._instance = super(ObsManager, cls).__new__(cls)
-        return cls._instance
+    Uma instância por OBS (ver ObsRegistry): cada uma com mirror, fila de
+    comandos e supervisor próprios.
+    """
 
-    def __init__(self):
-        if hasattr(self, 'initialized'): return
+    def __init__(self, name=DEFAULT_INSTANCE):
+        self.name = name
         self.client = None
         self.host = "127.0.0.1"
         self.port = 4455
         self.password = None
         self.is_connected = False
-        self.initialized = True
-        self.logger = logging.getLogger("ObsManager")
+        self.callback = None
+        self.mirror = ObsStateMirror(self)
+        self.worker = ObsCommandWorker(name)
+        self.meters = ObsMeterStream(self)
+        self.thumbnails = ObsThumbnailService(self)
+        self.coalescer = Coalescer()
+        self._items = {}  # (cena, fonte) -> {"id": sceneItemId, "enabled": último estado conhecido}
+        self.health_interval = 10
+        self.request_timeout = 1.0   # prazo de resposta de um comando simples
+        self.slow_timeout = 5.0      # lotes e screenshots (o OBS demora mais para responder)
+        self._late = 0               # respostas de comandos que estouraram o prazo, ainda por chegar
+        self._backoff = Backoff(base=1, cap=30)
+        self._supervisor = None
+        self._wake = LightQueue()
+        self._connecting = None
+        self._last_error = None
+        self._announced = None     # último status avisado ao callback
+        self.logger = logging.getLogger(f"ObsManager[{name}]")
 
-    def configure(self, host, port, password):
+    def configure(self, host, port, password, callback=None, queue_size=64, command_timeout=5.0, debounce=0.12,
+                  request_timeout=1.0):
         self.host = host
         self.port = port
         self.password = password
+        self.callback = callback
+        self.worker.maxsize = queue_size
+        self.worker.timeout = command_timeout
+        self.request_timeout = request_timeout
+        self.slow_timeout = max(request_timeout, command_timeout)
+        self.coalescer.window = debounce
+
+    def _notify(self, event_type, data):
+        if self.callback:
+            self.callback(event_type, data)
+
+    # --- Supervisor da conexão ---
+
+    def start(self):
+        """Inicia o supervisor (idempotente)."""
+        if self._supervisor is None or self._supervisor.dead:
+            self._supervisor = eventlet.spawn(self._supervise)
+
+    def reconnect_now(self):
+        """Pula a espera do backoff e tenta já (reconexão manual)."""
+        self.start()
+        self._backoff.reset()
+        self._wake.put(True)
+
+    def _supervise(self):
+        while True:
+            try:
+                if not self.is_connected and not self.connect():
+                    delay = self._backoff.next()
+                else:
+                    self._backoff.reset()
+                    delay = self.health_interval
+            except Exception:
+                # Nada pode encerrar o supervisor: sem ele o OBS nunca mais reconecta
+                self.logger.exception("Erro inesperado no supervisor do OBS")
+                delay = self._backoff.next()
+            try:
+                self._wake.get(timeout=delay)
+            except Empty:
+                try:
+                    self._health_check()
+                except Exception:
+                    self.logger.exception("Erro inesperado na checagem do OBS")
+
+    def _health_check(self):
+        # Com o mirror vivo a queda chega como evento; sem ele, um ping barato
+        if not self.is_connected or (self.mirror.ready and self.mirror.is_alive()): return
+        self.execute(lambda c: c.get_version())
+        # Conexão ok mas mirror morto (snapshot falhou): tenta subir de novo
+        if self.is_connected and self.mirror.start() and self.is_connected:
+            self.logger.info("Estado do OBS recarregado")
+            # Mesmo aviso de quando conecta: painéis recebem cenas e estados dos toggles
+            self._notify("STATUS", {"connected": True, "message": "Conectado"})
+
+    def _announce(self, connected, message):
+        if connected != self._announced:
+            self._announced = connected
+            self._notify("STATUS", {"connected": connected, "message": message})
+
+    def connection_lost(self, reason):
+        """Conexão caiu (comando falhou ou eventos pararam): o supervisor reconecta."""
+        if not self.is_connected: return
+        self.logger.warning(f"OBS desconectado: {reason}")
+        self.mirror.stop()
+        self.forget_scene_items()
+        self.thumbnails.forget()
+        self.is_connected = False
+        self._announce(False, "Desconectado")
+        self._wake.put(True)
 
     def connect(self):
         """
-        Tenta estabelecer conexão com o OBS uma única vez.
+        Uma tentativa de conexão. Chamadas simultâneas esperam a mesma tentativa.
         Não lança exceções no console, apenas retorna False se falhar.
         """
+        if self._connecting:
+            return self._connecting.wait()
         if self.is_connected:
-            try:
-                self.client.get_version()
-                return True
-            except:
-                self.is_connected = False
-        
+            return True
+
+        self._connecting = Event()
+        try:
+            result = self._open()
+        finally:
+            done, self._connecting = self._connecting, None
+        done.send(result)
+        return result
+
+    def _open(self):
+        old = self.client
+        if old:
+            try: old.disconnect()
+            except Exception: pass
         try:
             self.client = obs.ReqClient(
                 host=self.host, 
                 port=self.port, 
                 password=self.password, 
-                timeout=1 # Timeout curto para não travar a UI
+                timeout=self.request_timeout # Timeout curto para não travar a UI
             )
+            self._late = 0
             version = self.client.get_version()
             self.is_connected = True
+            self._last_error = None
             self.logger.info(f"Conectado ao OBS v{version.obs_version}")
+            # Estado em memória atualizado por eventos (leituras do painel não vão ao OBS).
+            # Se falhar, o health check tenta de novo com a conexão já de pé.
+            if not self.mirror.start():
+                self.logger.warning("Conectado sem estado espelhado; nova tentativa no próximo health check")
+            if not self.is_connected:
+                return False  # caiu durante o snapshot (connection_lost já avisou)
+            self._announce(True, "Conectado")
             return True
         except Exception as e:
-            # Log simplificado para evitar poluição visual
+            # Log simplificado (e só quando o erro muda) para não poluir a cada nova tentativa
             error_msg = str(e)
-            if "10061" in error_msg or "refused" in error_msg.lower():
-                self.logger.warning("Não foi possível conectar ao OBS (Porta fechada ou app desligado).")
-            else:
-                self.logger.warning(f"Falha ao conectar OBS: {error_msg}")
+            if error_msg != self._last_error:
+                if "10061" in error_msg or "refused" in error_msg.lower():
+                    self.logger.warning("Não foi possível conectar ao OBS (Porta fechada ou app desligado).")
+                else:
+                    self.logger.warning(f"Falha ao conectar OBS: {error_msg}")
+            self._last_error = error_msg
             
             self.is_connected = False
+            self._announce(False, "Desconectado")
             return False
 
     def execute(self, command_lambda):
         """
-        Executa comando. Se falhar, marca como desconectado e NÃO tenta reconectar.
+        Executa comando. Se falhar retorna None (queda de conexão fica com o supervisor).
         """
-        if not self.is_connected:
+        try:
+            return self.call(command_lambda)
+        except Exception:
             return None
 
+    def call(self, command_lambda, key=None, timeout=None, request_timeout=None):
+        """
+        Igual a execute(), mas levanta a exceção em vez de retornar None
+        (para quem precisa saber se o comando falhou).
+        Passa pela fila do worker: `key` junta comandos redundantes ainda na fila
+        (fica o último) e `timeout` é o prazo total, fila + execução.
+        `request_timeout` é o prazo da resposta do OBS (padrão: `request_timeout`).
+        """
+        if not self.is_connected:
+            raise ConnectionError("OBS desconectado")
+        return self.worker.submit(lambda: self._run(command_lambda, request_timeout), key=key, timeout=timeout)
+
+    def _run(self, command_lambda, request_timeout=None):
+        """Executa no worker (um comando por vez na conexão)."""
+        if not self.is_connected:
+            raise ConnectionError("OBS desconectado")
+        ws = self.client.base_client.ws
+        try:
+            self._drain(ws)
+        except Exception as e:
+            # Nem a resposta atrasada chegou: o OBS parou de responder
+            self.connection_lost(f"sem resposta do OBS: {e}")
+            raise ConnectionError("OBS desconectado") from e
+
+        ws.settimeout(request_timeout or self.request_timeout)
         try:
             return command_lambda(self.client)
+        except OBSSDKRequestError:
+            raise  # OBS respondeu com erro (ex.: fonte inexistente): a conexão está boa
+        except (OBSSDKTimeoutError, WebSocketTimeoutException) as e:
+            # Só demorou: a conexão segue de pé e a resposta, quando vier, é descartada
+            self._late += 1
+            raise TimeoutError(f"OBS não respondeu em {request_timeout or self.request_timeout:.1f}s") from e
         except Exception as e:
-            self.logger.warning(f"Comando falhou. Marcando OBS como desconectado: {e}")
-            self.is_connected = False
-            return None
+            self.connection_lost(f"comando falhou: {e}")
+            raise
+        finally:
+            ws.settimeout(self.request_timeout)
 
-    def get_scene_details(self):
-        def _logic(c):
-            scenes = []
-            scene_list = c.get_scene_list().scenes
-            
-            for s in scene_list:
-                items = c.get_scene_item_list(s['sceneName']).scene_items
-                sources = [{"name": i['sourceName'], "id": i['sceneItemId']} for i in items]
-                scenes.append({"name": s['sceneName'], "sources": sources})
-            
-            inputs = c.get_input_list().inputs
-            audio_inputs = [
-                {"name": i['inputName']} 
-                for i in inputs 
-                if any(x in i.get('inputKind', '') for x in ['capture', 'audio', 'input'])
-            ]
-            
-            return {"scenes": scenes, "audio_inputs": audio_inputs}
+    def _drain(self, ws):
+        """Lê e descarta as respostas atrasadas (senão o próximo comando leria uma delas)."""
+        if not self._late: return
+        ws.settimeout(self.slow_timeout)
+        while self._late > 0:
+            ws.recv()
+            self._late -= 1
 
+    def batch(self, requests, parallel=False, halt_on_failure=False):
+        """
+        Envia várias requisições num único RequestBatch (uma ida e volta).
+        `requests`: lista de (requestType, requestData|None).
+        Retorna, na mesma ordem, [{"type", "ok", "data"|"error"}].
+        Levanta ConnectionError se offline (como call()).
+        """
+        if not requests: return []
+
+        def _send(c):
+            ws = c.base_client.ws
+            batch_id = uuid.uuid4().hex
+            payload = {"op": 8, "d": {
+                "requestId": batch_id,
+                "executionType": BATCH_PARALLEL if parallel else BATCH_SERIAL,
+                "haltOnFailure": bool(halt_on_failure) and not parallel,
+                "requests": [
+                    {"requestType": req_type, "requestId": str(pos), **({"requestData": data} if data else {})}
+                    for pos, (req_type, data) in enumerate(requests)
+                ],
+            }}
+            ws.send(json.dumps(payload))
+            # Conexão de requisições não assina eventos: a próxima mensagem op 9 com nosso id é a resposta
+            while True:
+                response = json.loads(ws.recv())
+                if response.get("op") == 9 and response["d"].get("requestId") == batch_id:
+                    return response["d"].get("results", [])
+
+        by_id = {r.get("requestId"): r for r in self.call(_send, request_timeout=self.slow_timeout)}
+        results = []
+        for pos, (req_type, _) in enumerate(requests):
+            r = by_id.get(str(pos))
+            if r is None:
+                results.append({"type": req_type, "ok": False, "error": "Não executada (lote interrompido)"})
+            elif r["requestStatus"]["result"]:
+                results.append({"type": req_type, "ok": True, "data": r.get("responseData", {})})
+            else:
+                status = r["requestStatus"]
+                results.append({"type": req_type, "ok": False, "error": status.get("comment") or f"Código {status.get('code')}"})
+        return results
+
+    def query_state(self, target):
+        """
+        Valor real de um alvo de botão toggle (ver services/button_state.py):
+        fonte visível, entrada mutada, live ou gravação ativas. None se não der para ler.
+        Vem do mirror quando ele conhece o alvo; senão pergunta ao OBS.
+        """
+        value = self.mirror.value(target)
+        if value is not None: return value
+        kind = target[0]
+        if kind == "scene_item":
+            try:
+                return self.scene_item(target[1], target[2])["enabled"]
+            except Exception:
+                return None
+        def _logic(c):
+            if kind == "input_mute":
+                return c.get_input_mute(target[1]).input_muted
+            if kind == "stream":
+                return c.get_stream_status().output_active
+            if kind == "record":
+                return c.get_record_status().output_active
         return self.execute(_logic)
 
+    # --- Comandos de estado absoluto (último pedido vence) ---
+    # O primeiro aperto sai na hora; os repetidos enquanto ele roda ou dentro da
+    # janela de debounce viram um comando só, com o estado final, que todos recebem.
+
+    def set_input_mute(self, input_name, muted):
+        """Retorna {"value": mute final, "merged": pedidos juntados}."""
+        key = ("mute", input_name)
+        return self.coalescer.submit(key, bool(muted), lambda v: self.call(lambda c: c.set_input_mute(input_name, v), key=key))
+
+    def set_program_scene(self, scene_name):
+        """Retorna {"value": cena final, "merged": pedidos juntados}."""
+        key = ("scene",)
+        return self.coalescer.submit(key, scene_name, lambda v: self.call(lambda c: c.set_current_program_scene(v), key=key))
+
+    # --- Cache de itens de cena ---
+    # O sceneItemId de uma fonte só muda quando a cena é editada: guardado aqui,
+    # um toggle de fonte vira uma requisição só. Os eventos do mirror invalidam.
+
+    def scene_item(self, scene, source, fetch=True):
+        """
+        {"id", "enabled"} de uma fonte numa cena: cache, depois mirror, depois OBS
+        (duas requisições, só na primeira vez). Com fetch=False retorna None se não souber.
+        """
+        key = (scene, source)
+        item = self._items.get(key)
+        if item: return item
+
+        item_id = self.mirror.item_id(scene, source)
+        enabled = self.mirror.value(("scene_item", scene, source))
+        if item_id is None or enabled is None:
+            if not fetch: return None
+            def _lookup(c):
+                iid = c.get_scene_item_id(scene, source).scene_item_id
+                return iid, c.get_scene_item_enabled(scene, iid).scene_item_enabled
+            item_id, enabled = self.call(_lookup)
+        item = self._items[key] = {"id": item_id, "enabled": enabled}
+        return item
+
+    def toggle_source(self, scene, source):
+        """Inverte a visibilidade de uma fonte e retorna o novo estado (1 requisição com cache quente)."""
+        for retry in (False, True):
+            item = self.scene_item(scene, source)
+            # Decide antes de enviar: o evento do mirror pode atualizar `item` durante a chamada
+            item_id, enabled = item["id"], not item["enabled"]
+            try:
+                self.call(lambda c: c.set_scene_item_enabled(scene, item_id, enabled))
+            except OBSSDKRequestError:
+                # Id velho (cena editada sem evento): esquece e busca de novo uma vez
+                self.forget_scene_items(scene)
+                if retry: raise
+                continue
+            item["enabled"] = enabled
+            return enabled
+
+    def forget_scene_items(self, scene=None):
+        """Invalida o cache de uma cena (ou tudo, com scene=None)."""
+        if scene is None:
+            self._items.clear()
+        else:
+            for key in [k for k in self._items if k[0] == scene]:
+                del self._items[key]
+
+    def _scene_item_enabled(self, scene, item_id, enabled):
+        for (cached_scene, _), item in self._items.items():
+            if cached_scene == scene and item["id"] == item_id:
+                item["enabled"] = enabled
+
+    def get_scene_details(self):
+        """Cenas, fontes e entradas de áudio, lidas do mirror em memória (None se offline)."""
+        if not self.is_connected or not self.mirror.ready: return None
+        return self.mirror.details()
+
+class ObsRegistry:
+    """
+    Conexões OBS nomeadas (ex.: PC de jogo e PC de stream).
+    Ações escolhem o alvo em params["obs"]: vazio = "default", um nome,
+    vários separados por vírgula (ou lista) ou "*" para todos.
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls, *args, **kwargs):
+        if not cls._instance:
+            with cls._lock:
+                if not cls._instance:
+                    cls._instance = super(ObsRegistry, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if hasattr(self, 'initialized'): return
+        self.managers = {}
+        self.initialized = True
+
+    def add(self, name):
+        if name not in self.managers:
+            self.managers[name] = ObsManager(name)
+        return self.managers[name]
+
+    def get(self, name=None):
+        manager = self.managers.get(name or DEFAULT_INSTANCE)
+        if not manager: raise KeyError(f"OBS desconhecido: {name}")
+        return manager
+
+    def names(self):
+        return list(self.managers)
+
+    def all(self):
+        return list(self.managers.values())
+
+    def targets(self, selector=None):
+        """Conexões escolhidas por params["obs"]."""
+        if not selector: return [self.get()]
+        if selector == "*": return self.all()
+        names = selector if isinstance(selector, (list, tuple)) else selector.split(",")
+        return [self.get(n.strip()) for n in names if n.strip()] or [self.get()]
+
+    def fan_out(self, selector, fn):
+        """
+        Roda fn(manager) em cada OBS alvo, em paralelo. Com um alvo só retorna
+        o resultado dele; com vários, {"instances": {nome: resultado}}.
+        Se algum falhar levanta RuntimeError dizendo quais (os outros já rodaram).
+        """
+        managers = self.targets(selector)
+        if len(managers) == 1: return fn(managers[0])
+
+        threads = {m.name: eventlet.spawn(fn, m) for m in managers}
+        results, errors = {}, {}
+        for name, thread in threads.items():
+            try:
+                results[name] = thread.wait()
+            except Exception as e:
+                errors[name] = str(e)
+        if errors:
+            raise RuntimeError("; ".join(f"{n}: {e}" for n, e in errors.items()))
+        return {"instances": results}
+
 # Instância Global
-obs_manager = ObsManager()
\ No newline at end of file
+obs_registry = ObsRegistry()
+# Conexão padrão (OBS_HOST/OBS_PORT)
+obs_manager = obs_registry.add(DEFAULT_INSTANCE)
\ No newline at end of file
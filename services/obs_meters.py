@@ -0,0 +1,135 @@
+import eventlet
+import logging
+import math
+import time
+
+import obsws_python as obs
+from obsws_python.subs import Subs
+
+# Faixa mostrada no medidor: -60 dB (vazio) a 0 dB (cheio), em 1 byte
+FLOOR_DB = -60.0
+
+def level_byte(mul):
+    """Nível linear do OBS (inputLevelsMul) -> 0..255."""
+    if mul <= 0: return 0
+    db = 20 * math.log10(mul)
+    return max(0, min(255, round((db - FLOOR_DB) / -FLOOR_DB * 255)))
+
+class ObsMeterStream:
+    """
+    Medidores de áudio (VU) para os painéis, sob demanda.
+
+    O OBS manda InputVolumeMeters ~20x/s para TODAS as entradas. Aqui:
+      - uma conexão de eventos só com esse assunto, aberta apenas enquanto
+        algum painel pediu medidores (e fechada quando o último sai);
+      - o evento só guarda o último nível das entradas que interessam;
+      - um laço a `fps` monta um frame binário por pasta visível (não por painel)
+        com as entradas que os botões dessa pasta usam, e pula frames repetidos.
+
+    `targets()` (configurado pelo app) -> {deck_id: [entradas]}.
+    Saída pelo callback do ObsManager:
+      "METER_LAYOUT" {"deck_id", "seq", "inputs"} quando a lista de uma pasta muda
+      "METER_FRAME" (deck_id, bytes): [seq] + [pico, rms] por entrada, na ordem do layout
+    """
+
+    def __init__(self, manager):
+        self.manager = manager
+        self.fps = 10
+        self.targets = lambda: {}
+        self.events = None
+        self.levels = {}       # entrada -> (rms, pico) lineares, maior canal
+        self._wanted = set()
+        self._layouts = {}     # deck_id -> (seq, [entradas])
+        self._last_frames = {}
+        self._seq = 0
+        self._thread = None
+        self._next_open = 0
+        self.logger = logging.getLogger("ObsMeterStream")
+
+    def configure(self, fps=10, targets=None):
+        self.fps = max(1.0, float(fps))
+        if targets: self.targets = targets
+
+    def update(self):
+        """Assinaturas mudaram: liga o laço se alguém quer medidores."""
+        if self.targets() and (self._thread is None or self._thread.dead):
+            self._thread = eventlet.spawn(self._loop)
+
+    def refresh_layout(self, deck_id):
+        """Painel novo na pasta: reenvia o layout no próximo frame."""
+        self._layouts.pop(deck_id, None)
+        self._last_frames.pop(deck_id, None)
+
+    # --- Conexão de medidores ---
+
+    def _open(self):
+        if time.monotonic() < self._next_open: return
+        self._next_open = time.monotonic() + 2
+        try:
+            self.events = obs.EventClient(
+                host=self.manager.host, port=self.manager.port,
+                password=self.manager.password, timeout=1,
+                subs=Subs.INPUTVOLUMEMETERS
+            )
+            self.events.callback.register(self.on_input_volume_meters)
+        except Exception as e:
+            self.logger.warning(f"Sem medidores do OBS: {e}")
+            self.events = None
+
+    def _close(self):
+        events, self.events = self.events, None
+        if events:
+            try: events.base_client.ws.close()
+            except Exception: pass
+        self.levels.clear()
+        self._layouts.clear()
+        self._last_frames.clear()
+
+    def _alive(self):
+        return bool(self.events and self.events.worker.is_alive())
+
+    def on_input_volume_meters(self, data):
+        wanted = self._wanted
+        for item in data.inputs:
+            name = item.get('inputName')
+            if name not in wanted: continue
+            channels = item.get('inputLevelsMul') or []
+            self.levels[name] = (
+                max((ch[0] for ch in channels), default=0.0),
+                max((ch[1] for ch in channels), default=0.0),
+            )
+
+    # --- Envio ---
+
+    def _loop(self):
+        interval = 1.0 / self.fps
+        try:
+            while True:
+                targets = {d: inputs for d, inputs in self.targets().items() if inputs}
+                if not targets: break
+                if self.manager.is_connected and not self._alive():
+                    self._open()
+                self._wanted = {name for inputs in targets.values() for name in inputs}
+                for deck_id, inputs in targets.items():
+                    self._send(deck_id, inputs)
+                eventlet.sleep(interval)
+        finally:
+            self._close()
+
+    def _send(self, deck_id, inputs):
+        layout = self._layouts.get(deck_id)
+        if not layout or layout[1] != inputs:
+            self._seq = (self._seq + 1) % 256
+            layout = self._layouts[deck_id] = (self._seq, list(inputs))
+            self._last_frames.pop(deck_id, None)
+            self.manager._notify("METER_LAYOUT", {"deck_id": deck_id, "seq": layout[0], "inputs": layout[1]})
+
+        frame = bytearray([layout[0]])
+        for name in inputs:
+            rms, peak = self.levels.get(name, (0.0, 0.0))
+            frame.append(level_byte(peak))
+            frame.append(level_byte(rms))
+        frame = bytes(frame)
+        if frame != self._last_frames.get(deck_id):
+            self._last_frames[deck_id] = frame
+            self.manager._notify("METER_FRAME", (deck_id, frame))
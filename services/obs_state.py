@@ -0,0 +1,321 @@
+import eventlet
+import functools
+import logging
+
+import obsws_python as obs
+
+# Tipos de entrada que aparecem como "áudio" no painel (mesmo filtro de antes)
+AUDIO_KINDS = ("capture", "audio", "input")
+
+def is_audio_kind(kind):
+    return any(x in (kind or "") for x in AUDIO_KINDS)
+
+class ObsStateMirror:
+    """
+    Cópia em memória do que o painel precisa saber do OBS: cenas e seus itens
+    (com visibilidade), entradas de áudio (com mute), cena atual, live e gravação.
+
+    Carrega um snapshot uma vez ao conectar e depois só aplica os eventos do
+    EventClient (SceneCreated, SceneItemEnableStateChanged, InputMuteStateChanged...).
+    Leituras do painel saem daqui, sem ida ao OBS. Cada mudança vai para o
+    ObsManager como:
+      - "PATCH": diff para os painéis ({"scenes": {nome: cena|None}, "order": [...], ...})
+      - "TARGET": (alvo, valor) para o estado dos botões toggle
+    """
+
+    def __init__(self, manager):
+        self.manager = manager
+        self.events = None
+        self.ready = False
+        self._loading = False
+        self._pending = []
+        self._reset()
+        self.logger = logging.getLogger("ObsStateMirror")
+
+    def _reset(self):
+        self.scenes = {}        # nome -> {"name", "sources": [{"name", "id", "enabled", "index"}]}
+        self.order = []         # nomes das cenas na ordem do OBS
+        self.inputs = {}        # nome -> {"name", "kind", "muted"}
+        self.current_scene = None
+        self.outputs = {"stream": None, "record": None}
+
+    # --- Ciclo de vida ---
+
+    def start(self):
+        """Abre a conexão de eventos e carrega o snapshot. Retorna False se falhar."""
+        if self.ready and self.is_alive(): return True
+        self.stop()
+        try:
+            self.events = obs.EventClient(
+                host=self.manager.host, port=self.manager.port,
+                password=self.manager.password, timeout=1
+            )
+        except Exception as e:
+            self.logger.warning(f"Sem eventos do OBS: {e}")
+            self.events = None
+            return False
+
+        # Eventos que chegam durante o snapshot ficam guardados e são aplicados depois
+        self._loading, self._pending = True, []
+        self.manager.forget_scene_items()
+        self.events.callback.register([self._buffered(getattr(self, name)) for name in dir(self) if name.startswith("on_")])
+        try:
+            self._load()
+        except Exception as e:
+            self.logger.warning(f"Falha ao carregar estado do OBS: {e}")
+            self._loading = False
+            self.stop()
+            return False
+
+        self._loading = False
+        pending, self._pending = self._pending, []
+        for handler, data in pending:
+            handler(data)
+        self.ready = True
+        eventlet.spawn(self._watch, self.events)
+        return True
+
+    def stop(self):
+        self.ready = False
+        events, self.events = self.events, None
+        if events:
+            try: events.base_client.ws.close()
+            except Exception: pass
+
+    def is_alive(self):
+        return bool(self.events and self.events.worker.is_alive())
+
+    def _watch(self, events):
+        """Espera a thread de eventos terminar (OBS fechou / rede caiu)."""
+        events.worker.join()
+        if events is self.events:
+            self.ready = False
+            self.manager.connection_lost("conexão de eventos encerrada")
+
+    def _buffered(self, handler):
+        @functools.wraps(handler)
+        def wrapper(data):
+            if self._loading:
+                self._pending.append((handler, data))
+            else:
+                handler(data)
+        return wrapper
+
+    def _load(self):
+        """Snapshot inicial (única vez que o mirror vai ao OBS): dois lotes, não 4+N+M requisições."""
+        self._reset()
+
+        def ok(result):
+            if not result["ok"]: raise RuntimeError(f"{result['type']}: {result['error']}")
+            return result["data"]
+
+        scene_list, input_list, stream, record = [ok(r) for r in self.manager.batch([
+            ("GetSceneList", None), ("GetInputList", None),
+            ("GetStreamStatus", None), ("GetRecordStatus", None),
+        ], parallel=True)]
+        self.current_scene = scene_list.get("currentProgramSceneName")
+        self.order = [s['sceneName'] for s in scene_list["scenes"]]
+        audio = [i['inputName'] for i in input_list["inputs"] if is_audio_kind(i.get('inputKind', ''))]
+
+        # Itens de todas as cenas e mute de todas as entradas de áudio no mesmo lote
+        results = self.manager.batch(
+            [("GetSceneItemList", {"sceneName": n}) for n in self.order] +
+            [("GetInputMute", {"inputName": n}) for n in audio],
+            parallel=True
+        )
+        for name, result in zip(self.order, results):
+            self.scenes[name] = {"name": name, "sources": [self._item(i) for i in ok(result)["sceneItems"]]}
+            self._sort_items(name)
+        # Entrada sem áudio de fato (ex.: captura de vídeo) responde erro: fica sem estado de mute
+        mutes = {n: r["data"]["inputMuted"] for n, r in zip(audio, results[len(self.order):]) if r["ok"]}
+
+        for i in input_list["inputs"]:
+            kind = i.get('inputKind', '')
+            self.inputs[i['inputName']] = {"name": i['inputName'], "kind": kind, "muted": mutes.get(i['inputName'])}
+
+        self.outputs["stream"] = stream.get("outputActive")
+        self.outputs["record"] = record.get("outputActive")
+
+    # --- Leitura ---
+
+    def details(self):
+        """Mesmo formato de antes do get_scene_details, com estado extra."""
+        return {
+            "scenes": [self._public_scene(self.scenes[n]) for n in self.order if n in self.scenes],
+            "audio_inputs": [{"name": i["name"], "muted": i["muted"]} for i in self.inputs.values() if is_audio_kind(i["kind"])],
+            "current_scene": self.current_scene,
+            "stream": self.outputs["stream"],
+            "record": self.outputs["record"],
+        }
+
+    def value(self, target):
+        """Valor conhecido de um alvo de botão toggle (ver services/button_state.py), ou None."""
+        if not self.ready: return None
+        kind = target[0]
+        if kind == "scene_item":
+            for item in self.scenes.get(target[1], {}).get("sources", []):
+                if item["name"] == target[2]: return item["enabled"]
+        elif kind == "input_mute":
+            return self.inputs.get(target[1], {}).get("muted")
+        elif kind in ("stream", "record"):
+            return self.outputs[kind]
+        return None
+
+    def item_id(self, scene_name, source_name):
+        """sceneItemId de uma fonte numa cena, ou None se o mirror não conhece."""
+        if not self.ready: return None
+        for item in self.scenes.get(scene_name, {}).get("sources", []):
+            if item["name"] == source_name: return item["id"]
+        return None
+
+    def _item(self, raw):
+        return {
+            "name": raw['sourceName'], "id": raw['sceneItemId'],
+            "enabled": raw.get('sceneItemEnabled', True), "index": raw.get('sceneItemIndex', 0),
+        }
+
+    def _sort_items(self, scene_name):
+        self.scenes[scene_name]["sources"].sort(key=lambda i: i["index"])
+
+    def _public_scene(self, scene):
+        return {"name": scene["name"], "sources": [{k: i[k] for k in ("name", "id", "enabled")} for i in scene["sources"]]}
+
+    def _find_item(self, scene_name, item_id):
+        for item in self.scenes.get(scene_name, {}).get("sources", []):
+            if item["id"] == item_id: return item
+        return None
+
+    # --- Diffs ---
+
+    def _scene_changed(self, name, order=False):
+        scene = self.scenes.get(name)
+        patch = {"scenes": {name: self._public_scene(scene) if scene else None}}
+        if order: patch["order"] = list(self.order)
+        self.manager._notify("PATCH", patch)
+
+    def _input_changed(self, name):
+        info = self.inputs.get(name)
+        if info and not is_audio_kind(info["kind"]): return
+        self.manager._notify("PATCH", {"inputs": {name: {"name": name, "muted": info["muted"]} if info else None}})
+
+    def _target(self, target, value):
+        if value is not None: self.manager._notify("TARGET", (target, value))
+
+    # --- Eventos do OBS (nome = on_<evento em snake_case>) ---
+
+    def on_scene_created(self, data):
+        if data.is_group or data.scene_name in self.scenes: return
+        self.scenes[data.scene_name] = {"name": data.scene_name, "sources": []}
+        self.order.insert(0, data.scene_name)  # OBS lista a mais nova primeiro
+        self._scene_changed(data.scene_name, order=True)
+
+    def on_scene_removed(self, data):
+        self.manager.forget_scene_items(data.scene_name)
+        if data.is_group or data.scene_name not in self.scenes: return
+        del self.scenes[data.scene_name]
+        self.order = [n for n in self.order if n != data.scene_name]
+        self._scene_changed(data.scene_name, order=True)
+
+    def on_scene_name_changed(self, data):
+        self.manager.forget_scene_items(data.old_scene_name)
+        scene = self.scenes.pop(data.old_scene_name, None)
+        if not scene: return
+        scene["name"] = data.scene_name
+        self.scenes[data.scene_name] = scene
+        self.order = [data.scene_name if n == data.old_scene_name else n for n in self.order]
+        if self.current_scene == data.old_scene_name: self.current_scene = data.scene_name
+        self._scene_changed(data.old_scene_name)
+        self._scene_changed(data.scene_name, order=True)
+
+    def on_scene_list_changed(self, data):
+        order = [s['sceneName'] for s in data.scenes]
+        if order != self.order:
+            self.order = order
+            self.manager._notify("PATCH", {"order": list(order)})
+
+    def on_current_program_scene_changed(self, data):
+        self.current_scene = data.scene_name
+        self.manager._notify("PATCH", {"current_scene": data.scene_name})
+
+    def on_scene_item_created(self, data):
+        self.manager.forget_scene_items(data.scene_name)
+        scene = self.scenes.get(data.scene_name)
+        if not scene or self._find_item(data.scene_name, data.scene_item_id): return
+        scene["sources"].append(self._item({
+            "sourceName": data.source_name, "sceneItemId": data.scene_item_id,
+            "sceneItemIndex": data.scene_item_index, "sceneItemEnabled": True,
+        }))
+        self._sort_items(data.scene_name)
+        self._scene_changed(data.scene_name)
+
+    def on_scene_item_removed(self, data):
+        self.manager.forget_scene_items(data.scene_name)
+        scene = self.scenes.get(data.scene_name)
+        if not scene: return
+        scene["sources"] = [i for i in scene["sources"] if i["id"] != data.scene_item_id]
+        self._scene_changed(data.scene_name)
+
+    def on_scene_item_list_reindexed(self, data):
+        self.manager.forget_scene_items(data.scene_name)
+        if data.scene_name not in self.scenes: return
+        for raw in data.scene_items:
+            item = self._find_item(data.scene_name, raw['sceneItemId'])
+            if item: item["index"] = raw['sceneItemIndex']
+        self._sort_items(data.scene_name)
+        self._scene_changed(data.scene_name)
+
+    def on_scene_item_enable_state_changed(self, data):
+        self.manager._scene_item_enabled(data.scene_name, data.scene_item_id, data.scene_item_enabled)
+        item = self._find_item(data.scene_name, data.scene_item_id)
+        if not item or item["enabled"] == data.scene_item_enabled: return
+        item["enabled"] = data.scene_item_enabled
+        self._scene_changed(data.scene_name)
+        self._target(("scene_item", data.scene_name, item["name"]), item["enabled"])
+
+    def on_input_created(self, data):
+        kind = getattr(data, "input_kind", "")
+        # Entradas novas nascem sem mute
+        self.inputs[data.input_name] = {"name": data.input_name, "kind": kind, "muted": False if is_audio_kind(kind) else None}
+        self._input_changed(data.input_name)
+
+    def on_input_removed(self, data):
+        if self.inputs.pop(data.input_name, None):
+            self.manager._notify("PATCH", {"inputs": {data.input_name: None}})
+
+    def on_input_name_changed(self, data):
+        info = self.inputs.pop(data.old_input_name, None)
+        if info:
+            info["name"] = data.input_name
+            self.inputs[data.input_name] = info
+            self.manager._notify("PATCH", {"inputs": {data.old_input_name: None}})
+            self._input_changed(data.input_name)
+        # Itens de cena mostram o nome da fonte
+        self.manager.forget_scene_items()
+        for scene in self.scenes.values():
+            if any(i["name"] == data.old_input_name for i in scene["sources"]):
+                for item in scene["sources"]:
+                    if item["name"] == data.old_input_name: item["name"] = data.input_name
+                self._scene_changed(scene["name"])
+
+    def on_input_mute_state_changed(self, data):
+        info = self.inputs.get(data.input_name)
+        if not info or info["muted"] == data.input_muted: return
+        info["muted"] = data.input_muted
+        self._input_changed(data.input_name)
+        self._target(("input_mute", data.input_name), data.input_muted)
+
+    def on_stream_state_changed(self, data):
+        self._output_changed("stream", data.output_active)
+
+    def on_record_state_changed(self, data):
+        self._output_changed("record", data.output_active)
+
+    def _output_changed(self, kind, active):
+        if self.outputs[kind] == active: return
+        self.outputs[kind] = active
+        self.manager._notify("PATCH", {kind: active})
+        self._target((kind,), active)
+
+    def on_exit_started(self, data):
+        self.ready = False
+        self.manager.connection_lost("OBS fechando")
@@ -0,0 +1,109 @@
+import eventlet
+import base64
+import hashlib
+import logging
+import time
+
+# Valor do campo "icon" de um botão que pede a miniatura da cena/fonte que ele controla
+THUMBNAIL_ICON = "obs-thumbnail"
+
+class ObsThumbnailService:
+    """
+    Miniaturas de cenas/fontes do OBS (GetSourceScreenshot) para ícones de botão.
+
+    - Tamanho pequeno e fixo (JPEG), guardadas em memória com ETag
+    - Um laço só atualiza as que algum painel está mostrando agora
+      (`targets()` -> nomes), cada uma no máximo a cada `ttl` segundos
+    - Todas as capturas (laço e pedidos HTTP) passam por um limite de
+      `max_per_sec`, para não pesar na renderização do OBS
+
+    Atualizações saem pelo callback do ObsManager: "THUMBNAIL" {"source", "etag"}.
+    """
+
+    def __init__(self, manager):
+        self.manager = manager
+        self.width, self.height, self.quality = 192, 108, 70
+        self.ttl = 5.0
+        self.max_per_sec = 2.0
+        self.targets = lambda: set()
+        self.cache = {}        # nome -> {"data", "etag", "at"}
+        self._next_slot = 0.0
+        self._thread = None
+        self.logger = logging.getLogger("ObsThumbnailService")
+
+    def configure(self, ttl=5.0, max_per_sec=2.0, targets=None):
+        self.ttl = max(0.5, float(ttl))
+        self.max_per_sec = max(0.1, float(max_per_sec))
+        if targets: self.targets = targets
+
+    def update(self):
+        """Painéis mudaram de pasta: liga o laço se alguma miniatura está visível."""
+        sources = self.targets()
+        self.forget(keep=sources)
+        if sources and (self._thread is None or self._thread.dead):
+            self._thread = eventlet.spawn(self._loop)
+
+    def get(self, source, max_wait=1.0):
+        """
+        (bytes, etag) da miniatura, ou None. Usa o cache se estiver fresco;
+        senão captura agora, desde que o limite libere em até `max_wait` s
+        (se não liberar, serve a cópia velha).
+        """
+        entry = self.cache.get(source)
+        if entry and time.monotonic() - entry["at"] < self.ttl:
+            return entry["data"], entry["etag"]
+        if self.manager.is_connected and self._wait_slot(max_wait):
+            entry = self._capture(source) or entry
+        return (entry["data"], entry["etag"]) if entry else None
+
+    def forget(self, keep=None):
+        """Descarta as miniaturas em cache (todas, ou as que não estão em `keep`)."""
+        for source in [s for s in self.cache if keep is None or s not in keep]:
+            del self.cache[source]
+
+    # --- Captura ---
+
+    def _wait_slot(self, max_wait=None):
+        """Limite global de capturas por segundo (espaçamento fixo entre elas)."""
+        now = time.monotonic()
+        slot = max(now, self._next_slot)
+        if max_wait is not None and slot - now > max_wait: return False
+        self._next_slot = slot + 1.0 / self.max_per_sec
+        if slot > now: eventlet.sleep(slot - now)
+        return True
+
+    def _capture(self, source):
+        try:
+            shot = self.manager.call(
+                lambda c: c.get_source_screenshot(source, "jpg", self.width, self.height, self.quality),
+                key=("thumbnail", source), request_timeout=self.manager.slow_timeout
+            )
+        except Exception as e:
+            self.logger.debug(f"Miniatura de {source} falhou: {e}")
+            return None
+        data = base64.b64decode(shot.image_data.split(",", 1)[-1])
+        etag = hashlib.sha1(data).hexdigest()[:16]
+        previous = self.cache.get(source)
+        entry = self.cache[source] = {"data": data, "etag": etag, "at": time.monotonic()}
+        if not previous or previous["etag"] != etag:
+            self.manager._notify("THUMBNAIL", {"source": source, "etag": etag})
+        return entry
+
+    def _loop(self):
+        while True:
+            sources = self.targets()
+            # Botão apagado ou pasta fechada: a miniatura sai do cache
+            self.forget(keep=sources)
+            if not sources: break
+            if not self.manager.is_connected:
+                eventlet.sleep(self.ttl)
+                continue
+            now = time.monotonic()
+            due = sorted(
+                (s for s in sources if now - self.cache.get(s, {}).get("at", 0) >= self.ttl),
+                key=lambda s: self.cache.get(s, {}).get("at", 0)  # mais velhas primeiro
+            )
+            for source in due:
+                self._wait_slot()
+                self._capture(source)
+            if not due: eventlet.sleep(min(1.0, self.ttl / 2))
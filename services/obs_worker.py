@@ -0,0 +1,118 @@
+import eventlet
+from eventlet.event import Event
+from eventlet.queue import LightQueue
+from collections import deque
+import logging
+import time
+
+class _Command:
+    __slots__ = ("fn", "key", "deadline", "done", "queued_at")
+
+    def __init__(self, fn, key, deadline):
+        self.fn = fn
+        self.key = key
+        self.deadline = deadline
+        self.done = Event()
+        self.queued_at = time.perf_counter()
+
+class ObsCommandWorker:
+    """
+    Fila única de comandos para uma conexão do OBS.
+    Uma green thread executa um comando por vez (a conexão de requisições não
+    aguenta pedidos intercalados); quem chama espera o resultado com prazo.
+
+    - Fila limitada: cheia -> OverflowError na hora, sem travar o handler
+    - Prazo por comando: se vencer na fila, o comando nem é enviado (TimeoutError)
+    - Coalescência: comandos com a mesma `key` ainda na fila viram um só, com a
+      função mais recente (5 trocas de cena seguidas -> só a última vai ao OBS)
+    - stats(): profundidade da fila e latências (espera na fila e execução)
+    """
+
+    def __init__(self, name="obs", maxsize=64, timeout=5.0):
+        self.name = name
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self.queue = LightQueue()
+        self._queued = {}     # key -> comando ainda na fila
+        self._thread = None
+        self._waits = deque(maxlen=200)
+        self._runs = deque(maxlen=200)
+        self.counters = {"submitted": 0, "coalesced": 0, "rejected": 0, "expired": 0, "failed": 0}
+        self.max_depth = 0
+        self.logger = logging.getLogger(f"ObsCommandWorker[{name}]")
+
+    def submit(self, fn, key=None, timeout=None):
+        """Enfileira fn() e espera o resultado (ou a exceção dele)."""
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.perf_counter() + timeout
+        self.counters["submitted"] += 1
+
+        cmd = self._queued.get(key) if key is not None else None
+        if cmd:
+            # Ainda não saiu da fila: vale só o pedido mais novo
+            cmd.fn = fn
+            cmd.deadline = max(cmd.deadline, deadline)
+            self.counters["coalesced"] += 1
+        else:
+            if self.queue.qsize() >= self.maxsize:
+                self.counters["rejected"] += 1
+                raise OverflowError(f"Fila do OBS ({self.name}) cheia")
+            cmd = _Command(fn, key, deadline)
+            if key is not None: self._queued[key] = cmd
+            self.queue.put(cmd)
+            self.max_depth = max(self.max_depth, self.queue.qsize())
+            self._ensure_running()
+
+        try:
+            with eventlet.Timeout(timeout):
+                return cmd.done.wait()
+        except eventlet.Timeout:
+            raise TimeoutError(f"OBS não respondeu em {timeout:.1f}s")
+
+    def _ensure_running(self):
+        if self._thread is None or self._thread.dead:
+            self._thread = eventlet.spawn(self._loop)
+
+    def _loop(self):
+        while True:
+            cmd = self.queue.get()
+            if cmd.key is not None and self._queued.get(cmd.key) is cmd:
+                del self._queued[cmd.key]
+
+            started = time.perf_counter()
+            self._waits.append(started - cmd.queued_at)
+            if started > cmd.deadline:
+                self.counters["expired"] += 1
+                cmd.done.send_exception(TimeoutError("Comando do OBS expirou na fila"))
+                continue
+
+            try:
+                result = cmd.fn()
+            except Exception as e:
+                self.counters["failed"] += 1
+                cmd.done.send_exception(e)
+            else:
+                cmd.done.send(result)
+            finally:
+                self._runs.append(time.perf_counter() - started)
+
+    def stats(self):
+        return {
+            "name": self.name,
+            "depth": self.queue.qsize(),
+            "max_depth": self.max_depth,
+            "maxsize": self.maxsize,
+            **self.counters,
+            "wait_ms": _summary(self._waits),
+            "run_ms": _summary(self._runs),
+        }
+
+def _summary(samples):
+    """Média, p95 e máximo (ms) das últimas amostras."""
+    if not samples: return {"avg": 0, "p95": 0, "max": 0}
+    ordered = sorted(samples)
+    return {
+        "avg": round(sum(ordered) / len(ordered) * 1000, 2),
+        "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 2),
+        "max": round(ordered[-1] * 1000, 2),
+    }
@@ -0,0 +1,47 @@
+import threading
+
+class PanelViews:
+    """
+    O que cada painel conectado está mostrando agora (sid -> pasta visível e
+    opções de streaming ao vivo). Serve para mandar só o que está na tela:
+    medidores de áudio, miniaturas...
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls, *args, **kwargs):
+        if not cls._instance:
+            with cls._lock:
+                if not cls._instance:
+                    cls._instance = super(PanelViews, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if hasattr(self, 'initialized'): return
+        self.views = {}   # sid -> {"deck_id": str, "meters": bool}
+        self.initialized = True
+
+    def get(self, sid):
+        return self.views.setdefault(sid, {"deck_id": None, "meters": False})
+
+    def set_deck(self, sid, deck_id):
+        """Atualiza a pasta visível. Retorna a anterior."""
+        view = self.get(sid)
+        previous, view["deck_id"] = view["deck_id"], deck_id
+        return previous
+
+    def set_option(self, sid, option, enabled):
+        self.get(sid)[option] = bool(enabled)
+
+    def remove(self, sid):
+        return self.views.pop(sid, None)
+
+    def decks(self, option=None):
+        """Pastas visíveis em algum painel (só dos que ligaram `option`, se informado)."""
+        return {
+            v["deck_id"] for v in self.views.values()
+            if v["deck_id"] and (option is None or v.get(option))
+        }
+
+# Instância Global
+panel_views = PanelViews()
@@ -0,0 +1,132 @@
+import eventlet
+from eventlet.queue import LightQueue, Empty
+import logging
+import threading
+import time
+
+from services.backoff import Backoff
+from services.twitch_client import helix, PRIORITY_BACKGROUND
+
+class _Channel:
+    __slots__ = ("broadcaster_id", "token", "sids", "snapshot", "fetched_at", "thread", "wake", "backoff")
+
+    def __init__(self, broadcaster_id):
+        self.broadcaster_id = broadcaster_id
+        self.token = None
+        self.sids = set()
+        self.snapshot = None
+        self.fetched_at = 0.0
+        self.thread = None
+        self.wake = LightQueue()
+        self.backoff = Backoff(base=5.0, cap=120.0)
+
+class StreamStatsPoller:
+    """
+    Status da live (viewers) e dados do canal, buscados UMA vez por canal
+    no servidor e empurrados aos painéis inscritos, em vez de cada aba
+    fazer polling próprio na Helix.
+
+    - Um laço por broadcaster, vivo só enquanto houver painel inscrito
+    - Intervalo adaptativo: `live_interval` com a live no ar, `offline_interval` fora
+    - Erros da Helix: mantém o último valor e tenta de novo com backoff
+    - Só avisa quando algo muda: callback("STATS", snapshot)
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls, *args, **kwargs):
+        if not cls._instance:
+            with cls._lock:
+                if not cls._instance:
+                    cls._instance = super(StreamStatsPoller, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if hasattr(self, 'initialized'): return
+        self.live_interval = 30.0
+        self.offline_interval = 90.0
+        self.callback = None
+        self.channels = {}     # broadcaster_id -> _Channel
+        self.logger = logging.getLogger("StreamStatsPoller")
+        self.initialized = True
+
+    def configure(self, callback=None, live_interval=30.0, offline_interval=90.0):
+        self.callback = callback
+        self.live_interval = max(5.0, float(live_interval))
+        self.offline_interval = max(self.live_interval, float(offline_interval))
+
+    def _notify(self, event_type, data):
+        if self.callback:
+            self.callback(event_type, data)
+
+    def subscribe(self, broadcaster_id, token, sid):
+        """Painel quer os números do canal; retorna o último snapshot (ou None se ainda não há)."""
+        channel = self.channels.setdefault(broadcaster_id, _Channel(broadcaster_id))
+        channel.token = token  # vale o token mais recente de quem se inscreveu
+        channel.sids.add(sid)
+        if channel.thread is None or channel.thread.dead:
+            # Laço novo começa sem sinais velhos (senão busca uma vez por sinal acumulado)
+            while channel.wake.qsize(): channel.wake.get_nowait()
+            channel.thread = eventlet.spawn(self._loop, channel)
+        return channel.snapshot
+
+    def unsubscribe(self, sid):
+        for channel in self.channels.values():
+            if sid not in channel.sids: continue
+            channel.sids.discard(sid)
+            if not channel.sids and channel.thread and not channel.thread.dead:
+                channel.wake.put(True)  # o laço percebe e encerra
+
+    def refresh(self, broadcaster_id):
+        """Algo mudou agora (ex.: título editado): busca já, sem esperar o intervalo."""
+        channel = self.channels.get(broadcaster_id)
+        if channel and channel.thread and not channel.thread.dead:
+            channel.wake.put(True)
+
+    def cached(self, broadcaster_id, max_age=None):
+        """Snapshot em cache se for mais novo que `max_age` (padrão: o intervalo atual)."""
+        channel = self.channels.get(broadcaster_id)
+        if not channel or not channel.snapshot: return None
+        if max_age is None: max_age = self._interval(channel.snapshot)
+        if time.monotonic() - channel.fetched_at > max_age: return None
+        return channel.snapshot
+
+    def _interval(self, snapshot):
+        return self.live_interval if snapshot and snapshot["status"] == "online" else self.offline_interval
+
+    def _loop(self, channel):
+        while channel.sids:
+            try:
+                snapshot = self._fetch(channel)
+            except Exception as e:
+                self.logger.warning(f"Stats da Twitch falharam ({channel.broadcaster_id}): {e}")
+                delay = min(channel.backoff.next(), self.offline_interval)
+            else:
+                channel.backoff.reset()
+                channel.fetched_at = time.monotonic()
+                if snapshot != channel.snapshot:
+                    channel.snapshot = snapshot
+                    try:
+                        self._notify("STATS", snapshot)
+                    except Exception:
+                        # Falha ao empurrar não pode encerrar o laço do canal
+                        self.logger.exception("Erro ao enviar stats da Twitch")
+                delay = self._interval(snapshot)
+            try:
+                channel.wake.get(timeout=delay)
+            except Empty:
+                pass
+
+    def _fetch(self, channel):
+        uid = channel.broadcaster_id
+        streams = helix.get("streams", channel.token, params={"user_id": uid}, priority=PRIORITY_BACKGROUND).json()["data"]
+        info = helix.get("channels", channel.token, params={"broadcaster_id": uid}, priority=PRIORITY_BACKGROUND).json()["data"]
+        snapshot = {"broadcaster_id": uid, "status": "offline", "viewer_count": None, "title": None, "category": None}
+        if streams:
+            snapshot.update(status="online", viewer_count=streams[0]["viewer_count"])
+        if info:
+            snapshot.update(title=info[0]["title"], category=info[0]["game_name"])
+        return snapshot
+
+# Instância Global
+stream_poller = StreamStatsPoller()
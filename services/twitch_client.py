@@ -0,0 +1,156 @@
+import eventlet
+import hashlib
+import logging
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Filas de prioridade: quem clicou passa na frente do polling em background
+PRIORITY_USER = 0
+PRIORITY_BACKGROUND = 1
+
+class _Bucket:
+    """Pontos de rate limit de um token, como a Twitch informou na última resposta."""
+    __slots__ = ("limit", "remaining", "reset_at")
+
+    def __init__(self, limit=800):
+        self.limit = limit
+        self.remaining = limit
+        self.reset_at = 0.0
+
+    def refill(self, now):
+        if self.reset_at and now >= self.reset_at:
+            self.remaining = self.limit
+            self.reset_at = 0.0
+
+class HelixClient:
+    """
+    Cliente único da API Helix (e do OAuth da Twitch).
+
+    - Sessão HTTP com pool keep-alive: as chamadas reaproveitam a conexão TLS
+      com api.twitch.tv em vez de abrir uma nova a cada rota.
+    - Token bucket por token de acesso, alimentado pelos headers
+      Ratelimit-Limit/Remaining/Reset de cada resposta. O polling em background
+      não gasta a reserva (`reserve` pontos); ações do usuário podem ir até zero.
+    - 429: espera até o Ratelimit-Reset e tenta de novo (até `retries` vezes).
+
+    request() devolve o requests.Response já checado (raise_for_status).
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls, *args, **kwargs):
+        if not cls._instance:
+            with cls._lock:
+                if not cls._instance:
+                    cls._instance = super(HelixClient, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if hasattr(self, 'initialized'): return
+        self.client_id = None
+        self.api_url = "https://api.twitch.tv/helix"
+        self.timeout = 5.0
+        self.retries = 2
+        self.max_wait = 10.0      # espera máxima por pontos (s) antes de desistir
+        self.reserve = 0.1        # fração do limite que o background não usa
+        self.session = self._new_session(pool_size=10)
+        self._buckets = {}        # hash do token -> _Bucket
+        self.counters = {"requests": 0, "retries": 0, "throttled": 0, "rejected": 0}
+        self.logger = logging.getLogger("HelixClient")
+        self.initialized = True
+
+    def configure(self, client_id, api_url=None, timeout=5.0, pool_size=10):
+        self.client_id = client_id
+        if api_url: self.api_url = api_url
+        self.timeout = timeout
+        self.session = self._new_session(pool_size)
+
+    def _new_session(self, pool_size):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size)
+        session.mount("https://", adapter)
+        return session
+
+    # --- API ---
+
+    def get(self, path, token, params=None, priority=PRIORITY_USER):
+        return self.request("GET", path, token, priority, params=params)
+
+    def patch(self, path, token, params=None, json=None, priority=PRIORITY_USER):
+        return self.request("PATCH", path, token, priority, params=params, json=json)
+
+    def post_form(self, url, data):
+        """POST fora da Helix (ex.: troca de código OAuth), pela mesma sessão."""
+        res = self.session.post(url, data=data, timeout=self.timeout)
+        res.raise_for_status()
+        return res
+
+    def request(self, method, path, token, priority=PRIORITY_USER, **kwargs):
+        if not token: raise ValueError("Token de acesso não encontrado.")
+        key = hashlib.sha1(token.encode()).hexdigest()
+        headers = {"Client-Id": self.client_id, "Authorization": f"Bearer {token}"}
+
+        for attempt in range(self.retries + 1):
+            self._acquire(key, priority)
+            self.counters["requests"] += 1
+            res = self.session.request(method, f"{self.api_url}/{path.lstrip('/')}",
+                                       headers=headers, timeout=self.timeout, **kwargs)
+            bucket = self._update_bucket(key, res)
+            if res.status_code != 429 or attempt == self.retries:
+                break
+            self.counters["retries"] += 1
+            wait = max(0.5, bucket.reset_at - time.time())
+            self.logger.warning(f"Twitch 429 em {path}: tentando de novo em {wait:.1f}s")
+            if wait > self.max_wait: break
+            eventlet.sleep(wait)
+
+        res.raise_for_status()
+        return res
+
+    def stats(self):
+        now = time.time()
+        return {
+            **self.counters,
+            "buckets": [
+                {"limit": b.limit, "remaining": b.remaining, "reset_in": round(max(0.0, b.reset_at - now), 1)}
+                for b in self._buckets.values()
+            ],
+        }
+
+    # --- Rate limit ---
+
+    def _acquire(self, key, priority):
+        """Gasta um ponto do bucket; sem pontos (ou só a reserva, para background) espera o reset."""
+        bucket = self._buckets.setdefault(key, _Bucket())
+        deadline = time.time() + self.max_wait
+        while True:
+            now = time.time()
+            bucket.refill(now)
+            floor = int(bucket.limit * self.reserve) if priority == PRIORITY_BACKGROUND else 0
+            if bucket.remaining > floor:
+                bucket.remaining -= 1
+                return
+            wait = (bucket.reset_at or now + 1) - now
+            if now + wait > deadline:
+                self.counters["rejected"] += 1
+                raise OverflowError("Limite da API da Twitch atingido")
+            self.counters["throttled"] += 1
+            eventlet.sleep(max(0.05, wait))
+
+    def _update_bucket(self, key, res):
+        bucket = self._buckets.setdefault(key, _Bucket())
+        headers = res.headers
+        try:
+            bucket.limit = int(headers.get("Ratelimit-Limit", bucket.limit))
+            bucket.remaining = int(headers.get("Ratelimit-Remaining", bucket.remaining))
+            bucket.reset_at = float(headers.get("Ratelimit-Reset", bucket.reset_at))
+        except (TypeError, ValueError):
+            pass
+        self.logger.debug(f"Rate limit: {bucket.remaining}/{bucket.limit}")
+        return bucket
+
+# Instância Global
+helix = HelixClient()
@@ -1,11 +1,45 @@
 import websocket
+import itertools
 import json
 import threading
 import time
 import os
 import logging
+from collections import deque
+
+from services.backoff import Backoff
+from services.obs_worker import _summary
+from services.vts_params import VtsParameterStream
+
+class _PendingRequest:
+    """Pedido enviado ao VTS esperando a resposta com o mesmo requestID."""
+    __slots__ = ("msg_type", "sent_at", "done", "response", "error")
+
+    def __init__(self, msg_type):
+        self.msg_type = msg_type
+        self.sent_at = time.perf_counter()
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
 
 class VtsManager:
+    """
+    Conexão com o VTube Studio.
+    request() envia com requestID único e espera a resposta correspondente
+    (a API responde fora de ordem e vários pedidos podem estar no ar).
+    Pendentes vencidos saem da tabela; ao cair a conexão todos falham na hora.
+    stats(): tempo de ida e volta por tipo de mensagem.
+
+    Um supervisor (start()) fica vivo o tempo todo: conecta, autentica com o
+    token salvo, bloqueia no recv() até a conexão cair e tenta de novo com
+    backoff. O callback só recebe "STATUS" nas transições conectou/caiu.
+
+    Hotkeys ficam em cache por modelID. A lista só é pedida de novo quando o
+    VTS avisa que outro modelo (ainda não visto) foi carregado, ou quando
+    dispara uma hotkey que o cache não conhece (hotkeys editadas no VTS).
+
+    Parâmetros injetados (faders, macros) passam por `params` (VtsParameterStream).
+    """
     _instance = None
     _lock = threading.Lock()
 
@@ -24,11 +58,23 @@ class VtsManager:
         
         self.ws = None
         self.token = None
-        self.hotkeys = []
+        self.model_id = None
+        self._hotkey_cache = {}    # modelID -> lista de hotkeys
         self.is_connected = False
+        self.authenticated = False
         self.callback = None
         self._keep_running = False
         self.thread = None
+        self.timeout = 3.0
+        self._pending = {}                        # requestID -> _PendingRequest
+        self._ids = itertools.count(1)
+        self._session = format(int(time.time()), "x")
+        self._rtt = {}                            # messageType -> deque de segundos
+        self.counters = {"sent": 0, "timeouts": 0, "errors": 0, "dropped": 0, "reconnects": 0}
+        self._backoff = Backoff(base=0.5, cap=10.0)
+        self._wake = threading.Event()
+        self._announced = None     # último status avisado ao callback
+        self.params = VtsParameterStream(self)
         
         self.logger = logging.getLogger("VtsManager")
         self.initialized = True
@@ -40,19 +86,22 @@ class VtsManager:
         self.callback = callback
 
     def start(self):
-        """
-        Inicia uma thread para tentar conexão. 
-        Se a thread anterior já morreu (por falha de conexão), inicia uma nova.
-        """
+        """Inicia o supervisor (idempotente)."""
+        self._keep_running = True
         if self.thread and self.thread.is_alive():
             return
-
-        self._keep_running = True
-        self.thread = threading.Thread(target=self._connection_loop, daemon=True)
+        self.thread = threading.Thread(target=self._supervise, daemon=True)
         self.thread.start()
 
+    def reconnect_now(self):
+        """Pula a espera do backoff e tenta já (reconexão manual ou hotkey sem conexão)."""
+        self.start()
+        self._backoff.reset()
+        self._wake.set()
+
     def stop(self):
         self._keep_running = False
+        self._wake.set()
         if self.ws:
             try: self.ws.close()
             except: pass
@@ -60,73 +109,169 @@ class VtsManager:
     def trigger_hotkey(self, hotkey_id):
         if not self.is_connected or not hotkey_id:
             return
-        self._send("HotkeyTriggerRequest", {"hotkeyID": hotkey_id})
+        return self.request("HotkeyTriggerRequest", {"hotkeyID": hotkey_id})
+
+    def request(self, msg_type, data=None, timeout=None):
+        """
+        Envia e espera a resposta deste pedido (o `data` dela).
+        ConnectionError sem conexão ou se ela cair; TimeoutError se o VTS não
+        responder a tempo; RuntimeError com a mensagem de um APIError.
+        """
+        if not self.ws: raise ConnectionError("VTS desconectado")
+        request_id = self._next_id()
+        pending = self._pending[request_id] = _PendingRequest(msg_type)
+        try:
+            if not self._send(msg_type, data, request_id):
+                raise ConnectionError("VTS desconectado")
+            if not pending.done.wait(self.timeout if timeout is None else timeout):
+                self.counters["timeouts"] += 1
+                raise TimeoutError(f"VTS não respondeu {msg_type}")
+        finally:
+            self._pending.pop(request_id, None)
+
+        if pending.error: raise pending.error
+        return pending.response
+
+    def stats(self):
+        return {
+            "connected": self.is_connected,
+            "pending": len(self._pending),
+            **self.counters,
+            "rtt_ms": {t: _summary(samples) for t, samples in self._rtt.items()},
+            "params": self.params.stats(),
+        }
+
+    def _next_id(self):
+        return f"{self._session}-{next(self._ids)}"
+
+    def _fail_pending(self, reason):
+        """Conexão caiu: quem espera resposta recebe o erro agora, sem esperar o prazo."""
+        pending, self._pending = self._pending, {}
+        for p in pending.values():
+            p.error = ConnectionError(reason)
+            p.done.set()
+
+    def _resolve(self, msg):
+        """Entrega a resposta a quem está esperando este requestID (se alguém estiver)."""
+        pending = self._pending.get(msg.get("requestID"))
+        if not pending:
+            return
+        self._rtt.setdefault(pending.msg_type, deque(maxlen=200)).append(time.perf_counter() - pending.sent_at)
+        data = msg.get("data", {})
+        if msg.get("messageType") == "APIError":
+            self.counters["errors"] += 1
+            pending.error = RuntimeError(f"VTS: {data.get('message') or data.get('errorID')}")
+        else:
+            pending.response = data
+        pending.done.set()
+
+    @property
+    def hotkeys(self):
+        """Hotkeys do modelo carregado agora (do cache, sem ir ao VTS)."""
+        return self._hotkey_cache.get(self.model_id, [])
 
     def request_hotkeys(self):
+        """Força buscar de novo a lista do modelo atual."""
         if self.is_connected:
             self._send("HotkeysInCurrentModelRequest")
 
+    def _subscribe_events(self):
+        for event_name in ("ModelLoadedEvent", "HotkeyTriggeredEvent"):
+            self._send("EventSubscriptionRequest", {"eventName": event_name, "subscribe": True, "config": {}})
+
+    def _set_model(self, model_id):
+        """Modelo carregado mudou: usa o cache ou busca a lista só se for novo."""
+        self.model_id = model_id
+        if model_id and model_id not in self._hotkey_cache:
+            self.request_hotkeys()
+        else:
+            self._notify("HOTKEYS", {"hotkeys": self.hotkeys, "model_id": model_id})
+
     def _notify(self, event_type, data):
         if self.callback:
             self.callback(event_type, data)
 
+    def _announce(self, connected, message):
+        if connected != self._announced:
+            self._announced = connected
+            self._notify("STATUS", {"connected": connected, "message": message})
+
+    def _supervise(self):
+        while self._keep_running:
+            try:
+                if self._connection_loop():
+                    # Chegou a conectar: a próxima tentativa começa do início do backoff
+                    self._backoff.reset()
+                    self.counters["reconnects"] += 1
+            except Exception:
+                # Nada pode encerrar o supervisor: sem ele o VTS nunca mais reconecta
+                self.logger.exception("Erro inesperado no supervisor do VTS")
+            delay = self._backoff.next()
+            self._wake.wait(delay)
+            self._wake.clear()
+        self.logger.info("Supervisor VTS encerrado.")
+
     def _connection_loop(self):
         """
-        Tenta conectar UMA VEZ. Se conseguir, mantém escutando. 
-        Se falhar ou cair, encerra.
+        Uma sessão: conecta, autentica e escuta (recv bloqueante, sem timeout)
+        até a conexão cair. Retorna True se chegou a conectar.
         """
         url = f"ws://{self.host}:{self.port}"
-        
-        self.logger.info(f"Tentando conectar ao VTS em {url}...")
-        
         try:
             self.ws = websocket.create_connection(url, timeout=2)
-            self.is_connected = True
-            self._notify("STATUS", {"connected": True, "message": "VTS Conectado"})
-            
+        except Exception:
+            # VTS fechado: silencioso no console, UI mostra desconectado
+            self._announce(False, "VTS Desconectado")
+            return False
+
+        self.logger.info(f"Conectado ao VTS em {url}")
+        self.ws.settimeout(None)
+        self.is_connected = True
+        self._announce(True, "VTS Conectado")
+
+        try:
             # Inicia fluxo de autenticação
             self._auth_flow()
-            
-            # Loop de leitura (só roda enquanto estiver conectado)
             while self._keep_running:
-                try:
-                    message = self.ws.recv()
-                    if not message: break
-                    self._handle_message(message)
-                except websocket.WebSocketTimeoutException:
-                    continue 
-                except Exception:
-                    break # Sai do loop se houver erro de socket
-                    
-        except Exception as e:
-            # Falha na conexão inicial ou erro crítico
-            pass # Silencioso no console, UI mostrará desconectado
+                message = self.ws.recv()
+                if not message: break
+                self._handle_message(message)
+        except Exception:
+            pass  # Erro de socket: a conexão caiu
 
         # Limpeza ao sair
         self.is_connected = False
-        self._notify("STATUS", {"connected": False, "message": "VTS Desconectado"})
+        self.authenticated = False
+        self._fail_pending("Conexão com o VTS caiu")
         if self.ws:
             try: self.ws.close()
             except: pass
         self.ws = None
-        self.logger.info("Thread VTS encerrada.")
+        self._announce(False, "VTS Desconectado")
+        self.logger.info("Conexão com o VTS encerrada.")
+        return True
 
-    def _send(self, msg_type, data=None):
-        if not self.ws: return
+    def _send(self, msg_type, data=None, request_id=None):
+        """Envia sem esperar resposta; retorna False se não deu para enviar."""
+        if not self.ws: return False
         payload = {
             "apiName": "FoxyDeck",
             "apiVersion": "1.0",
-            "requestID": str(int(time.time()*1000)),
+            "requestID": request_id or self._next_id(),
             "messageType": msg_type
         }
         if data: payload["data"] = data
         try:
             self.ws.send(json.dumps(payload))
+            self.counters["sent"] += 1
+            return True
         except:
-            pass
+            self.counters["dropped"] += 1
+            return False
 
     def _auth_flow(self):
-        if os.path.exists(self.token_file):
+        # Reconexões reaproveitam o token em memória; o arquivo só na primeira vez
+        if not self.token and os.path.exists(self.token_file):
             try:
                 with open(self.token_file, 'r') as f:
                     data = json.load(f)
@@ -148,6 +293,7 @@ class VtsManager:
             msg = json.loads(message_str)
             msg_type = msg.get("messageType")
             data = msg.get("data", {})
+            self._resolve(msg)
 
             if msg_type == "AuthenticationTokenResponse":
                 self.token = data.get("authenticationToken")
@@ -155,17 +301,33 @@ class VtsManager:
                 self._auth_flow()
 
             elif msg_type == "AuthenticationResponse":
-                if data.get("authenticated"):
+                self.authenticated = bool(data.get("authenticated"))
+                if self.authenticated:
                     self._notify("STATUS", {"connected": True, "message": "VTS Autenticado"})
-                    self.request_hotkeys()
+                    # O modelo pode ter mudado enquanto estávamos fora: pergunta qual é (barato)
+                    self._subscribe_events()
+                    self._send("CurrentModelRequest")
                 else:
                     self.token = None
                     if os.path.exists(self.token_file): os.remove(self.token_file)
                     self._send("AuthenticationTokenRequest", { "pluginName": "FoxyDeck", "pluginDeveloper": "Foxy" })
 
+            elif msg_type == "CurrentModelResponse":
+                self._set_model(data.get("modelID") if data.get("modelLoaded") else None)
+
+            elif msg_type == "ModelLoadedEvent":
+                self._set_model(data.get("modelID") if data.get("modelLoaded") else None)
+
             elif msg_type == "HotkeysInCurrentModelResponse":
-                self.hotkeys = data.get("availableHotkeys", [])
-                self._notify("HOTKEYS", {"hotkeys": self.hotkeys})
+                self.model_id = data.get("modelID") if data.get("modelLoaded", True) else None
+                if self.model_id:
+                    self._hotkey_cache[self.model_id] = data.get("availableHotkeys", [])
+                self._notify("HOTKEYS", {"hotkeys": self.hotkeys, "model_id": self.model_id})
+
+            elif msg_type == "HotkeyTriggeredEvent":
+                known = {h.get("hotkeyID") for h in self._hotkey_cache.get(data.get("modelID"), [])}
+                if data.get("modelID") == self.model_id and data.get("hotkeyID") not in known:
+                    self.request_hotkeys()
 
             elif msg_type == "APIError" and data.get("errorID") == 100:
                 self._notify("STATUS", {"connected": False, "message": "Aceite a permissão no VTube Studio!"})
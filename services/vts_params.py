@@ -0,0 +1,189 @@
+import eventlet
+import logging
+import math
+import re
+import time
+
+# Curvas de interpolação: progresso 0..1 -> fração do caminho até o alvo
+CURVES = {
+    "linear": lambda t: t,
+    "step": lambda t: 1.0 if t >= 1 else 0.0,
+    "ease_in": lambda t: t * t,
+    "ease_out": lambda t: 1 - (1 - t) ** 2,
+    "ease_in_out": lambda t: t * t * (3 - 2 * t),
+}
+
+class _Param:
+    __slots__ = ("start", "target", "began", "duration", "curve", "source", "sent", "sent_at", "expires")
+
+    def __init__(self, start, target, began, duration, curve, source, expires=None):
+        self.start = start
+        self.target = target
+        self.began = began
+        self.duration = duration
+        self.curve = curve
+        self.source = source
+        self.sent = None
+        self.sent_at = 0.0
+        self.expires = expires
+
+    def value(self, now):
+        if self.duration <= 0 or now >= self.began + self.duration:
+            return self.target
+        progress = CURVES[self.curve]((now - self.began) / self.duration)
+        return self.start + (self.target - self.start) * progress
+
+class VtsParameterStream:
+    """
+    Injeção de parâmetros no VTube Studio (faders, macros) em frames.
+
+    Cada set() só grava o alvo do parâmetro (vale o último, venha de qual
+    fonte vier); um laço a `fps` monta UM InjectParameterDataRequest por frame
+    com os valores que mudaram. Um pedido por vez: se o VTS demora a
+    responder, os frames perdidos são contados e os valores intermediários
+    somem (o próximo frame já leva o valor atual).
+
+    O VTS devolve o parâmetro ao tracking se ficar ~1s sem receber valor, então
+    parâmetros parados são reenviados a cada `keepalive` até release() ou,
+    com `hold`, até vencer o tempo (depois o VTS volta sozinho ao tracking).
+    O laço só roda enquanto houver parâmetro ativo.
+    """
+
+    def __init__(self, manager):
+        self.manager = manager
+        self.fps = 30.0
+        self.keepalive = 0.5
+        self.max_params = 64
+        self._params = {}      # parameterID -> _Param
+        self._thread = None
+        self.counters = {"frames": 0, "values": 0, "dropped": 0, "errors": 0, "rejected": 0}
+        self.rejected = {}     # parameterID -> erro do VTS (tirado da injeção)
+        self.logger = logging.getLogger("VtsParameterStream")
+
+    def configure(self, fps=30):
+        self.fps = max(1.0, min(60.0, float(fps)))
+
+    def set(self, param_id, value, duration=0.0, curve="linear", source=None, hold=None):
+        """
+        Novo alvo para o parâmetro; com `duration` (s) ele anda até lá pela curva.
+        `hold` (s): solta sozinho esse tempo depois de chegar ao alvo (None = até release()).
+        """
+        if not param_id: raise ValueError("Parâmetro não informado")
+        if curve not in CURVES: raise ValueError(f"Curva desconhecida: {curve}")
+        if param_id not in self._params and len(self._params) >= self.max_params:
+            raise OverflowError("Parâmetros demais sendo injetados")
+        value = float(value)
+        if not math.isfinite(value): raise ValueError(f"Valor inválido: {value}")
+        self.rejected.pop(param_id, None)
+
+        now = time.perf_counter()
+        current = self._params.get(param_id)
+        start = current.value(now) if current else value
+        duration = max(0.0, float(duration))
+        expires = now + duration + max(0.0, float(hold)) if hold is not None else None
+        param = self._params[param_id] = _Param(start, value, now, duration, curve, source, expires)
+        if current: param.sent, param.sent_at = current.sent, current.sent_at
+        self._ensure_running()
+        return value
+
+    def release(self, param_id=None, source=None):
+        """Para de injetar (um parâmetro, tudo de uma fonte, ou tudo); o VTS volta ao tracking."""
+        for pid in [p for p, param in self._params.items()
+                    if (param_id is None or p == param_id) and (source is None or param.source == source)]:
+            del self._params[pid]
+
+    def stats(self):
+        return {"fps": self.fps, "active": len(self._params), **self.counters, "rejected_ids": dict(self.rejected)}
+
+    def _ensure_running(self):
+        if self._thread is None or self._thread.dead:
+            self._thread = eventlet.spawn(self._loop)
+
+    def _loop(self):
+        period = 1.0 / self.fps
+        next_at = time.perf_counter()
+        while self._params:
+            if not self.manager.authenticated:
+                # Sem VTS: guarda os alvos e confere de novo daqui a pouco
+                eventlet.sleep(1)
+                next_at = time.perf_counter()
+                continue
+
+            now = time.perf_counter()
+            if now < next_at:
+                eventlet.sleep(next_at - now)
+                now = time.perf_counter()
+            late = int((now - next_at) / period)
+            if late: self.counters["dropped"] += late
+            next_at += (late + 1) * period
+
+            if not self._send_frame(now):
+                # Pedido recusado (parâmetro inexistente, VTS caiu): não insiste a cada frame
+                eventlet.sleep(1)
+                next_at = time.perf_counter()
+
+    def _send_frame(self, now):
+        due = []
+        for pid, param in list(self._params.items()):
+            if param.expires is not None and now >= param.expires:
+                del self._params[pid]
+                continue
+            value = param.value(now)
+            if value != param.sent or now - param.sent_at >= self.keepalive:
+                due.append((param, {"id": pid, "value": value}))
+        if not due: return True
+
+        try:
+            self._inject(due, now)
+        except RuntimeError as e:
+            # APIError: um id ruim recusa o frame inteiro; tira o culpado e segue com os outros
+            self.counters["errors"] += 1
+            return self._quarantine(due, now, e)
+        except Exception as e:
+            self.counters["errors"] += 1
+            self.logger.warning(f"Injeção de parâmetros falhou: {e}")
+            return False
+        return True
+
+    def _inject(self, due, now):
+        self.manager.request("InjectParameterDataRequest", {
+            "faceFound": False,
+            "mode": "set",
+            "parameterValues": [v for _, v in due],
+        })
+        self.counters["frames"] += 1
+        self.counters["values"] += len(due)
+        for param, v in due:
+            param.sent, param.sent_at = v["value"], now
+
+    def _quarantine(self, due, now, error):
+        """
+        Descobre quais ids o VTS recusou: os citados na mensagem de erro ou,
+        se ela não disser, testando um por um. Esses saem da injeção (ficam em
+        `rejected` até um novo set()); o resto vai no frame normalmente.
+        """
+        named = [(p, v) for p, v in due if re.search(rf"\b{re.escape(v['id'])}\b", str(error))]
+        suspects = named or due
+        good = [(p, v) for p, v in due if (p, v) not in suspects]
+        if not named:
+            for param, v in suspects:
+                try:
+                    self._inject([(param, v)], now)
+                except RuntimeError as e:
+                    self._reject(v["id"], e)
+                except Exception:
+                    return False
+        else:
+            for _, v in named: self._reject(v["id"], error)
+        if good:
+            try:
+                self._inject(good, now)
+            except Exception:
+                return False
+        return True
+
+    def _reject(self, param_id, error):
+        self._params.pop(param_id, None)
+        self.rejected[param_id] = str(error)
+        self.counters["rejected"] += 1
+        self.logger.warning(f"Parâmetro {param_id} recusado pelo VTS: {error}")
@@ -0,0 +1,87 @@
+import { store } from './store.js';
+import { fetchConditional } from './utils.js';
+
+// Pastas com download em andamento (deck_id -> Promise)
+const pending = {};
+// Pastas alteradas por patch enquanto o download estava em andamento
+const touchedWhileLoading = new Set();
+
+// Baixa o índice de pastas (ETags) sem o conteúdo dos botões
+export async function loadDeckIndex() {
+    const { data } = await fetchConditional('/api/decks');
+    store.setDeckIndex(data);
+    return data;
+}
+
+// Garante que a pasta está no cache local; só vai à rede se ainda não foi baixada
+export function ensureDeck(deckId) {
+    if (store.get('deckConfig').decks[deckId]) return Promise.resolve(true);
+    return fetchDeck(deckId);
+}
+
+// Navega para uma pasta (ação open_deck), baixando-a na primeira vez
+export async function openDeck(deckId) {
+    try {
+        if (await ensureDeck(deckId)) store.set('currentDeckId', deckId);
+    } catch (e) {
+        console.error(`Falha ao abrir pasta ${deckId}:`, e);
+    }
+}
+
+function fetchDeck(deckId) {
+    if (pending[deckId]) return pending[deckId];
+
+    pending[deckId] = (async () => {
+        try {
+            const etag = store.get('deckEtags')[deckId] || null;
+            const res = await fetchConditional(`/api/decks/${encodeURIComponent(deckId)}`, etag);
+            if (res.status !== 304) store.setDeck(deckId, res.data.buttons, res.etag);
+            return true;
+        } catch (e) {
+            console.error(`Pasta ${deckId} indisponível:`, e);
+            return false;
+        } finally {
+            delete pending[deckId];
+        }
+    })();
+
+    return pending[deckId].then(ok => {
+        // Um patch chegou antes da resposta: a cópia pode estar velha, busca de novo
+        if (ok && touchedWhileLoading.delete(deckId)) return fetchDeck(deckId);
+        return ok;
+    });
+}
+
+// Resposta 409: outro painel alterou a pasta antes. Busca o estado atual e avisa.
+export async function handleDeckConflict(e) {
+    if (e.status !== 409) return false;
+    await resyncDecks();
+    alert("Outro painel alterou esta pasta enquanto você editava. A versão atual foi carregada; refaça a alteração.");
+    return true;
+}
+
+export function handleDeckPatch(patch) {
+    patch.ops.forEach(op => { if (pending[op.deck]) touchedWhileLoading.add(op.deck); });
+    if (!store.applyDeckPatch(patch)) {
+        console.log(`[Decks] Lacuna de versão (v${store.get('deckVersion')} -> v${patch.version}). Ressincronizando...`);
+        resyncDecks();
+    }
+}
+
+// Reconexão ou lacuna: compara o índice e rebaixa só as pastas carregadas que mudaram (304 nas demais)
+export async function resyncDecks(index = null) {
+    try {
+        if (!index) {
+            // O ETag do índice é "<epoch>-<versão>": se nada mudou, o servidor responde 304
+            const epoch = store.get('deckEpoch');
+            const res = await fetchConditional('/api/decks', epoch ? `${epoch}-${store.get('deckVersion')}` : null);
+            if (res.status === 304) return;
+            index = res.data;
+        }
+        const stale = store.setDeckIndex(index);
+        await Promise.all(stale.map(fetchDeck));
+        if (!store.hasDeck(store.get('currentDeckId'))) store.set('currentDeckId', 'root');
+    } catch (e) {
+        console.error("Falha ao ressincronizar decks:", e);
+    }
+}
@@ -3,7 +3,8 @@ import { initDeck } from './ui/deck.js';
 import { initTwitch } from './ui/twitch.js';
 import { initEditor } from './ui/editor.js';
 import { initStatus } from './ui/status.js'; // [NOVO]
-import { fetchApi } from './utils.js';
+import { initMeters } from './meters.js';
+import { loadDeckIndex, ensureDeck } from './decks.js';
 import { store } from './store.js';
 
 document.addEventListener('DOMContentLoaded', async () => {
@@ -15,14 +16,15 @@ document.addEventListener('DOMContentLoaded', async () => {
     initTwitch();
     initEditor();
     initStatus(); // [NOVO] Inicializa gerenciador de status e botões
+    initMeters();
 
-    // 2. Carrega configuração inicial
+    // 2. Carrega o índice de pastas e só a pasta inicial (as outras sob demanda)
     try {
-        const config = await fetchApi('/api/deck_config');
-        store.updateDeckConfig(config);
+        const index = await loadDeckIndex();
         
         // Define deck inicial
-        const startDeck = config.settings?.start_deck || "root";
+        const startDeck = index.settings?.start_deck || "root";
+        await ensureDeck(startDeck);
         store.set('currentDeckId', startDeck);
     } catch (e) {
         console.error("Erro fatal ao carregar config:", e);
@@ -0,0 +1,55 @@
+import { socket } from './socket.js';
+import { store } from './store.js';
+
+// Medidores de áudio ao vivo nos botões de mute (opt-in).
+// Liga com settings.show_meters na config ou, só neste painel, localStorage.meters = 'on' / 'off'.
+let layout = null;   // { deck_id, seq, inputs } da pasta visível
+let enabled = false;
+
+export function initMeters() {
+    socket.on('connect', announce);
+    store.subscribe('currentDeckId', () => {
+        layout = null;
+        socket.emit('view_deck', { deck_id: store.get('currentDeckId') });
+    });
+    store.subscribe('deckConfig', syncEnabled);
+
+    socket.on('meter_layout', (l) => {
+        if (l.deck_id === store.get('currentDeckId')) layout = l;
+    });
+    socket.on('meter_frame', drawFrame);
+}
+
+function wantsMeters() {
+    const local = localStorage.getItem('meters');
+    if (local) return local === 'on';
+    return !!store.get('deckConfig').settings?.show_meters;
+}
+
+// Reconexão: o servidor esqueceu o que este painel vê
+function announce() {
+    socket.emit('view_deck', { deck_id: store.get('currentDeckId') });
+    if (enabled) socket.emit('meters_subscribe', { enabled: true });
+}
+
+function syncEnabled() {
+    const want = wantsMeters();
+    if (want === enabled) return;
+    enabled = want;
+    document.body.classList.toggle('meters-on', enabled);
+    socket.emit('meters_subscribe', { enabled });
+}
+
+// Frame binário: [seq, pico0, rms0, pico1, rms1, ...] na ordem de layout.inputs
+function drawFrame(buffer) {
+    const bytes = new Uint8Array(buffer);
+    if (!layout || bytes[0] !== layout.seq) return;
+    layout.inputs.forEach((name, i) => {
+        const peak = bytes[1 + i * 2] / 255;
+        const rms = bytes[2 + i * 2] / 255;
+        document.querySelectorAll(`.vu[data-input="${CSS.escape(name)}"]`).forEach(el => {
+            el.firstElementChild.style.width = `${Math.round(rms * 100)}%`;
+            el.lastElementChild.style.left = `${Math.round(peak * 100)}%`;
+        });
+    });
+}
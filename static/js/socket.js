@@ -1,4 +1,6 @@
 import { store } from './store.js';
+import { handleDeckPatch, resyncDecks } from './decks.js';
+import { thumbnailUrl } from './ui/deck.js';
 
 export const socket = io(window.location.origin + '/dashboard');
 
@@ -7,19 +9,56 @@ export function initSocket() {
         console.log("[Socket] Conectado");
         socket.emit("get_obs_scene_details");
         socket.emit("get_vts_data");
+        socket.emit("macro_status", (list) => {
+            store.set('runningMacros', Object.fromEntries((list || []).map(m => [m.key, m.macro_id])));
+        });
+        // Reconexão: podemos ter perdido patches enquanto estávamos fora
+        if (store.get('deckEpoch')) resyncDecks();
     });
 
-    socket.on('deck_updated', (config) => {
+    // Arquivo de config recarregado no servidor: vem só o índice de ETags
+    socket.on('deck_index', (index) => {
         console.log("[Socket] Deck atualizado");
-        store.updateDeckConfig(config);
+        resyncDecks(index);
     });
 
+    socket.on('deck_patch', handleDeckPatch);
+
     socket.on('obs_status', (data) => updateStatusUI('obs', data));
     socket.on('vts_status', (data) => updateStatusUI('vts', data));
 
+    // Um OBS por instância; as listas "padrão" (obsScenes/obsAudioSources) seguem o "default"
+    socket.on('obs_instances', ({ instances }) => store.set('obsInstances', instances || ['default']));
+
     socket.on('obs_scene_details_data', (data) => {
-        store.set('obsScenes', data.scenes || []);
-        store.set('obsAudioSources', data.audio_inputs || []);
+        const instance = data.instance || 'default';
+        store.get('obsInstanceData')[instance] = { scenes: data.scenes || [], audio_inputs: data.audio_inputs || [] };
+        if (instance === 'default') {
+            store.set('obsScenes', data.scenes || []);
+            store.set('obsAudioSources', data.audio_inputs || []);
+        }
+    });
+
+    // Mudanças no OBS chegam como diff do mirror do servidor
+    socket.on('obs_state_patch', applyObsPatch);
+
+    // Miniatura nova: troca só o src das imagens (sem re-renderizar o deck)
+    socket.on('obs_thumbnail', ({ source, etag }) => {
+        store.get('obsThumbs')[source] = etag;
+        document.querySelectorAll(`img[data-thumb="${CSS.escape(source)}"]`).forEach(img => {
+            img.src = thumbnailUrl(source);
+        });
+    });
+
+    // Estado dos toggles: snapshot completo ao conectar, depois só deltas
+    socket.on('button_states', ({ states, full }) => {
+        store.set('buttonStates', full ? states : { ...store.get('buttonStates'), ...states });
+    });
+
+    // Macros rodando no servidor (qualquer painel pode ter iniciado)
+    socket.on('macro_started', (m) => setMacroRunning(m.key, m.macro_id));
+    ['macro_finished', 'macro_cancelled', 'macro_failed'].forEach(ev => {
+        socket.on(ev, (m) => setMacroRunning(m.key, null));
     });
 
     socket.on('vts_data_list', (data) => {
@@ -29,6 +68,38 @@ export function initSocket() {
     // Eventos Twitch (Feed) são tratados no módulo UI/Twitch
 }
 
+function applyObsPatch(patch) {
+    const instance = patch.instance || 'default';
+    const data = store.get('obsInstanceData')[instance];
+    if (!data) return; // Ainda sem snapshot desse OBS; ele vem inteiro na conexão
+    if (patch.scenes || patch.order) {
+        const scenes = new Map(data.scenes.map(s => [s.name, s]));
+        for (const [name, scene] of Object.entries(patch.scenes || {})) {
+            if (scene) scenes.set(name, scene);
+            else scenes.delete(name);
+        }
+        const order = patch.order || [...scenes.keys()];
+        data.scenes = order.filter(n => scenes.has(n)).map(n => scenes.get(n));
+        if (instance === 'default') store.set('obsScenes', data.scenes);
+    }
+    if (patch.inputs) {
+        const inputs = new Map(data.audio_inputs.map(i => [i.name, i]));
+        for (const [name, input] of Object.entries(patch.inputs)) {
+            if (input) inputs.set(name, input);
+            else inputs.delete(name);
+        }
+        data.audio_inputs = [...inputs.values()];
+        if (instance === 'default') store.set('obsAudioSources', data.audio_inputs);
+    }
+}
+
+function setMacroRunning(key, macroId) {
+    const running = store.get('runningMacros');
+    if (macroId) running[key] = macroId;
+    else delete running[key];
+    store.set('runningMacros', running);
+}
+
 function updateStatusUI(service, data) {
     // Dispara evento customizado para quem estiver ouvindo na UI
     const event = new CustomEvent('status-update', { detail: { service, ...data } });
@@ -3,11 +3,19 @@ class Store {
     constructor() {
         this.state = {
             deckConfig: { decks: {}, settings: {} },
+            deckVersion: 0,   // Versão da config no servidor (patches incrementais)
+            deckEpoch: null,  // Muda quando o servidor reinicia
+            deckIndex: {},    // deck_id -> ETag de todas as pastas no servidor
+            deckEtags: {},    // deck_id -> ETag das pastas já baixadas (deckConfig.decks)
             currentDeckId: "root",
             obsScenes: [],
             obsAudioSources: [],
+            obsInstances: ['default'], // OBS configurados no servidor (OBS_INSTANCES)
+            obsInstanceData: {},       // instância -> {scenes, audio_inputs}
+            obsThumbs: {},    // cena/fonte -> ETag da miniatura mais recente
             vtsHotkeys: [],
-            buttonStates: {}, // Para botões toggle (ON/OFF)
+            buttonStates: {}, // Botões toggle (ON/OFF), "deck/slot" -> bool vindo do servidor
+            runningMacros: {}, // "deck/slot" -> macro_id em execução no servidor
             isEditMode: false
         };
         this.listeners = [];
@@ -24,13 +32,85 @@ class Store {
 
     // Atalho para atualizar config inteira e resetar estados se necessário
     updateDeckConfig(config) {
+        if (config.version !== undefined) {
+            this.state.deckVersion = config.version;
+            this.state.deckEpoch = config.epoch;
+        }
         this.state.deckConfig = config;
-        if (!this.state.deckConfig.decks[this.state.currentDeckId]) {
+        if (!this.hasDeck(this.state.currentDeckId)) {
             this.state.currentDeckId = "root";
         }
         this.notify('deckConfig', config);
     }
 
+    // Versão sobre a qual uma edição está sendo feita (o servidor rejeita com 409 se ficou velha)
+    deckBase() {
+        return { base_version: this.state.deckVersion, base_epoch: this.state.deckEpoch };
+    }
+
+    // Deck existe no servidor (carregado ou não)?
+    hasDeck(deckId) {
+        return !!this.state.deckConfig.decks[deckId] || deckId in this.state.deckIndex;
+    }
+
+    // Índice {deck_id: etag} vindo de /api/decks. Descarta pastas que sumiram
+    // e retorna as carregadas cujo conteúdo mudou (precisam ser rebaixadas).
+    setDeckIndex(index) {
+        const decks = this.state.deckConfig.decks;
+        this.state.deckIndex = index.decks;
+        this.state.deckVersion = index.version;
+        this.state.deckEpoch = index.epoch;
+        this.state.deckConfig.settings = index.settings || {};
+
+        Object.keys(decks).forEach(id => {
+            if (!(id in index.decks)) {
+                delete decks[id];
+                delete this.state.deckEtags[id];
+            }
+        });
+        return Object.keys(decks).filter(id => this.state.deckEtags[id] !== index.decks[id]);
+    }
+
+    // Guarda uma pasta baixada de /api/decks/<id>
+    setDeck(deckId, buttons, etag) {
+        this.state.deckConfig.decks[deckId] = buttons;
+        this.state.deckEtags[deckId] = etag;
+        this.state.deckIndex[deckId] = etag;
+        this.updateDeckConfig(this.state.deckConfig);
+    }
+
+    // Aplica um patch {epoch, version, ops, etags} do servidor.
+    // Retorna false se houver lacuna de versão (quem chamou deve ressincronizar).
+    applyDeckPatch(patch) {
+        if (patch.epoch !== this.state.deckEpoch) return false;
+        if (patch.version <= this.state.deckVersion) return true; // Já aplicado
+        if (patch.version !== this.state.deckVersion + 1) return false;
+
+        const decks = this.state.deckConfig.decks;
+        patch.ops.forEach(op => {
+            // Pastas ainda não baixadas: só o ETag do índice muda (busca virá fresca)
+            if (!decks[op.deck] && op.op !== 'set_deck') return;
+            switch (op.op) {
+                case 'set_button':
+                    decks[op.deck][op.slot] = op.button;
+                    break;
+                case 'delete_button':
+                    delete decks[op.deck][op.slot];
+                    break;
+                case 'set_deck':
+                    decks[op.deck] = op.buttons;
+                    break;
+            }
+        });
+        Object.entries(patch.etags || {}).forEach(([deckId, etag]) => {
+            this.state.deckIndex[deckId] = etag;
+            if (decks[deckId]) this.state.deckEtags[deckId] = etag;
+        });
+        this.state.deckVersion = patch.version;
+        this.updateDeckConfig(this.state.deckConfig);
+        return true;
+    }
+
     subscribe(key, callback) {
         this.listeners.push({ key, callback });
     }
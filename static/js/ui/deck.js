@@ -2,6 +2,7 @@ import { store } from '../store.js';
 import { executeAction } from '../actions.js';
 import { openEditModal } from './editor.js';
 import { fetchApi } from '../utils.js';
+import { handleDeckConflict } from '../decks.js';
 
 let gridElement = null;
 
@@ -19,6 +20,7 @@ export function initDeck() {
     store.subscribe('currentDeckId', renderDeck);
     store.subscribe('isEditMode', renderDeck);
     store.subscribe('buttonStates', renderDeck); // Atualiza visual quando estado muda
+    store.subscribe('runningMacros', renderDeck);
 
     // Inicializa Drag and Drop com verificação de segurança
     if (typeof Sortable !== 'undefined') {
@@ -44,6 +46,7 @@ function renderDeck() {
     const fullConfig = store.get('deckConfig');
     const isEditMode = store.get('isEditMode');
     const buttonStates = store.get('buttonStates');
+    const runningMacros = store.get('runningMacros');
 
     // Proteção se a config ainda não carregou
     if (!fullConfig || !fullConfig.decks) return;
@@ -61,9 +64,12 @@ function renderDeck() {
             btn.className = `deck-button ${getActionClass(config)}`;
             btn.innerHTML = generateButtonContent(config);
             
-            if (config.is_stateful && buttonStates[slotId]) {
+            if (config.is_stateful && buttonStates[`${currentDeckId}/${slotId}`]) {
                 btn.classList.add('is-active');
             }
+            if (runningMacros[`${currentDeckId}/${slotId}`]) {
+                btn.classList.add('macro-running');
+            }
 
             btn.onclick = () => {
                 if (isEditMode) openEditModal(slotId, config);
@@ -83,6 +89,7 @@ async function handleReorder(evt) {
     if (evt.oldIndex === evt.newIndex) return;
 
     const deckId = store.get('currentDeckId');
+    const base = store.deckBase();
     const buttonsInOrder = gridElement.querySelectorAll('.deck-button');
     const newLayout = {};
 
@@ -104,9 +111,11 @@ async function handleReorder(evt) {
     try {
         await fetchApi('/api/save_deck_layout', {
             method: 'POST',
-            body: JSON.stringify({ deck_id: deckId, buttons: newLayout })
+            body: JSON.stringify({ deck_id: deckId, buttons: newLayout, ...base })
         });
     } catch (e) {
+        // Em conflito, o resync desfaz a reordenação local
+        if (await handleDeckConflict(e)) return;
         console.error("Falha ao salvar ordem", e);
     }
 }
@@ -123,10 +132,37 @@ function getActionClass(config) {
 
 function generateButtonContent(config) {
     let iconHtml = '';
-    if (config.icon && (config.icon.startsWith('http') || config.icon.startsWith('/uploads'))) {
+    const thumbSource = config.icon === 'obs-thumbnail' ? thumbnailSource(config) : null;
+    if (thumbSource) {
+        // Miniatura ao vivo da cena/fonte; socket.js troca o src quando o servidor avisa que mudou
+        iconHtml = `<img data-thumb="${thumbSource.replace(/"/g, '&quot;')}" src="${thumbnailUrl(thumbSource)}">`;
+    } else if (config.icon && (config.icon.startsWith('http') || config.icon.startsWith('/uploads'))) {
         iconHtml = `<img src="${config.icon}">`;
     } else {
         iconHtml = `<i class="${config.icon || 'fa-solid fa-question'}"></i>`;
     }
-    return `${iconHtml}<span>${config.label}</span>`;
+    return `${iconHtml}<span>${config.label}</span>${meterHtml(config)}`;
+}
+
+// Cena/fonte que o botão controla (mesma regra de thumbnail_source no servidor)
+function thumbnailSource(config) {
+    for (const action of config.actions_on || []) {
+        const p = action.params || {};
+        if (action.type === 'obs_source' && p.source_name) return p.source_name;
+        if (action.type === 'obs_scene' && p.scene_name) return p.scene_name;
+    }
+    return null;
+}
+
+export function thumbnailUrl(source) {
+    const etag = store.get('obsThumbs')[source];
+    return `/api/obs_thumbnail?source=${encodeURIComponent(source)}${etag ? `&v=${etag}` : ''}`;
+}
+
+// Barra de VU para botões de mute (preenchida por meters.js; escondida sem body.meters-on)
+function meterHtml(config) {
+    const mute = (config.actions_on || []).find(a => a.type === 'obs_set_mute_on' || a.type === 'obs_set_mute_off');
+    const input = mute?.params?.input_name;
+    if (!input) return '';
+    return `<div class="vu" data-input="${input.replace(/"/g, '&quot;')}"><div class="vu-fill"></div><div class="vu-peak"></div></div>`;
 }
\ No newline at end of file
@@ -1,9 +1,11 @@
 import { store } from '../store.js';
 import { fetchApi } from '../utils.js';
+import { handleDeckConflict } from '../decks.js';
 
 const modalElement = document.getElementById('edit-modal');
 const modal = new bootstrap.Modal(modalElement);
 let currentSlotId = null;
+let editBase = null; // Versão do deck quando o modal foi aberto
 let cropper = null;
 let originalFile = null; // Armazena o arquivo original para GIFs
 
@@ -59,6 +61,7 @@ function destroyCropper() {
 
 export function openEditModal(slotId, config) {
     currentSlotId = slotId;
+    editBase = store.deckBase();
     document.getElementById('edit-button-form').reset();
     document.getElementById('action-list-on').innerHTML = '';
     document.getElementById('action-list-off').innerHTML = '';
@@ -149,12 +152,14 @@ async function saveButtonConfig() {
             body: JSON.stringify({
                 slot_id: currentSlotId,
                 deck_id: store.get('currentDeckId'),
-                config
+                config,
+                ...editBase
             })
         });
         
         modal.hide();
     } catch(e) { 
+        if (await handleDeckConflict(e)) { modal.hide(); return; }
         alert("Erro ao salvar: " + e.message); 
         console.error(e);
     } finally {
@@ -245,17 +250,52 @@ function populateActionTypes(select) {
             <option value="sound">Tocar Som</option>
             <option value="hotkey">Atalho de Teclado</option>
             <option value="open_deck">Abrir Pasta</option>
+            <option value="wait">Esperar (macro)</option>
         </optgroup>
         <optgroup label="VTube Studio">
             <option value="vts_hotkey">Disparar Hotkey</option>
+            <option value="vts_param">Definir Parâmetro</option>
+            <option value="vts_param_release">Soltar Parâmetro</option>
         </optgroup>
     `;
 }
 
+// Com mais de um OBS configurado, cada ação OBS escolhe em qual roda (params.obs)
+function hydrateObsInstance(type, container, params) {
+    const instances = store.get('obsInstances') || ['default'];
+    let select = container.querySelector('.param-obs');
+    if (instances.length < 2) {
+        if (select) select.closest('.mb-3').remove();
+        return '';
+    }
+    if (!select) {
+        const group = document.createElement('div');
+        group.className = 'mb-3';
+        group.innerHTML = `<label class="form-label">OBS</label><select class="form-select form-select-sm param-obs"></select>`;
+        container.prepend(group);
+        select = group.querySelector('select');
+    }
+    select.innerHTML = '';
+    select.add(new Option('Padrão', ''));
+    instances.filter(n => n !== 'default').forEach(n => select.add(new Option(n, n)));
+    select.add(new Option('Todos', '*'));
+    select.value = params?.obs || '';
+    // Listas de cenas/entradas passam a ser as do OBS escolhido
+    select.onchange = () => hydrateParams(type, container, { ...params, obs: select.value });
+    return select.value;
+}
+
+function obsLists(instance) {
+    const data = store.get('obsInstanceData')[instance && instance !== '*' ? instance.split(',')[0] : 'default'];
+    return data || { scenes: store.get('obsScenes') || [], audio_inputs: store.get('obsAudioSources') || [] };
+}
+
 function hydrateParams(type, container, params = {}) {
+    const obsTypes = ['obs_scene', 'obs_source', 'obs_set_mute_on', 'obs_set_mute_off', 'obs_stream_toggle', 'obs_record_toggle'];
+    const obs = obsTypes.includes(type) ? obsLists(hydrateObsInstance(type, container, params)) : null;
     if (type === 'obs_scene' || type === 'obs_source') {
         const sceneSelect = container.querySelector('.param-scene-name') || container.querySelector('.param-source-scene');
-        const sceneList = store.get('obsScenes') || [];
+        const sceneList = obs.scenes;
         populateSelect(sceneSelect, sceneList.map(s => ({ value: s.name, label: s.name })), params?.scene_name);
 
         if (type === 'obs_source') {
@@ -272,7 +312,7 @@ function hydrateParams(type, container, params = {}) {
     }
     if (type === 'obs_set_mute_on' || type === 'obs_set_mute_off') {
         const audioSelect = container.querySelector('.param-audio-input-name');
-        const audioList = store.get('obsAudioSources') || [];
+        const audioList = obs.audio_inputs;
         populateSelect(audioSelect, audioList.map(a => ({ value: a.name, label: a.name })), params?.input_name);
     }
     if (type === 'vts_hotkey') {
@@ -283,6 +323,13 @@ function hydrateParams(type, container, params = {}) {
     if (params?.file_name) { const inp = container.querySelector('.param-file-name'); if (inp) inp.value = params.file_name; }
     if (params?.keys_str) { const inp = container.querySelector('.param-keys-str'); if (inp) inp.value = params.keys_str; }
     if (params?.deck_id) { const inp = container.querySelector('.param-deck-id'); if (inp) inp.value = params.deck_id; }
+    if (params?.ms) { const inp = container.querySelector('.param-ms'); if (inp) inp.value = params.ms; }
+    if (type === 'vts_param' || type === 'vts_param_release') {
+        ['parameter_id', 'value', 'duration_ms', 'curve', 'hold_ms'].forEach(key => {
+            const inp = container.querySelector(`.param-${key.replace(/_/g, '-')}`);
+            if (inp && params?.[key] !== undefined) inp.value = params[key];
+        });
+    }
 }
 
 function populateSelect(selectElement, items, selectedValue) {
@@ -322,9 +369,13 @@ function readActionsFromList(listId) {
 
 async function deleteButtonConfig() {
     if(!confirm("Deletar?")) return;
-    await fetchApi('/api/delete_button', {
-        method: 'POST',
-        body: JSON.stringify({ slot_id: currentSlotId, deck_id: store.get('currentDeckId') })
-    });
+    try {
+        await fetchApi('/api/delete_button', {
+            method: 'POST',
+            body: JSON.stringify({ slot_id: currentSlotId, deck_id: store.get('currentDeckId'), ...editBase })
+        });
+    } catch (e) {
+        if (!(await handleDeckConflict(e))) alert("Erro ao deletar: " + e.message);
+    }
     modal.hide();
 }
\ No newline at end of file
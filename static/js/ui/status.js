@@ -2,20 +2,22 @@ import { socket } from '../socket.js';
 
 export function initStatus() {
     document.addEventListener('status-update', (e) => {
-        const { service, connected, message } = e.detail;
-        renderStatus(service, connected, message);
+        const { service, connected, message, instance } = e.detail;
+        renderStatus(service, connected, message, instance);
     });
 }
 
-function renderStatus(service, connected, message) {
+function renderStatus(service, connected, message, instance = 'default') {
+    // Cada OBS extra (OBS_INSTANCES) ganha seu próprio alerta, com sufixo no id
+    const suffix = (service === 'obs' && instance !== 'default') ? `-${instance}` : '';
     const targets = service === 'obs' 
-        ? ['obs-status-message', 'obs-status-message-config'] 
+        ? [`obs-status-message${suffix}`, `obs-status-message-config${suffix}`] 
         : ['vts-status-msg-main', 'vts-status-msg-config'];
 
     targets.forEach(id => {
         let el = document.getElementById(id);
         if (!el) el = createStatusElement(id, service);
-        if (el) updateElementState(el, service, connected, message);
+        if (el) updateElementState(el, service, connected, message, suffix ? instance : null);
     });
 }
 
@@ -61,12 +63,13 @@ function createStatusElement(id, service) {
     return el;
 }
 
-function updateElementState(el, service, connected, message) {
+function updateElementState(el, service, connected, message, instance = null) {
     el.className = `alert ${connected ? 'alert-success' : 'alert-danger'} mt-2 d-flex justify-content-between align-items-center`;
     el.innerHTML = '';
 
     const span = document.createElement('span');
-    span.innerHTML = `<strong>${service.toUpperCase()}:</strong> ${message}`;
+    const name = instance ? `${service.toUpperCase()} (${instance})` : service.toUpperCase();
+    span.innerHTML = `<strong>${name}:</strong> ${message}`;
     el.appendChild(span);
 
     if (!connected) {
@@ -77,7 +80,8 @@ function updateElementState(el, service, connected, message) {
         btn.onclick = () => {
             btn.disabled = true;
             btn.innerHTML = '<i class="fa-solid fa-spin fa-spinner"></i> Tentando...';
-            socket.emit(`reconnect_${service}`);
+            if (service === 'obs') socket.emit('reconnect_obs', { instance: instance || 'default' });
+            else socket.emit(`reconnect_${service}`);
             setTimeout(() => {
                 if(btn && btn.isConnected) {
                     btn.disabled = false;
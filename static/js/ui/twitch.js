@@ -4,7 +4,10 @@ import { socket } from '../socket.js';
 export function initTwitch() {
     loadChannelInfo();
     loadStreamStats();
-    setInterval(loadStreamStats, 60000);
+    // Sem polling por aba: o servidor busca uma vez por canal e empurra quando muda
+    socket.on('connect', () => socket.emit('stream_stats_subscribe'));
+    if (socket.connected) socket.emit('stream_stats_subscribe');
+    socket.on('stream_stats', renderStreamStats);
 
     // Listeners de UI
     document.getElementById('update-button')?.addEventListener('click', updateChannelInfo);
@@ -23,21 +26,28 @@ async function loadChannelInfo() {
 
 async function loadStreamStats() {
     try {
-        const data = await fetchApi('/api/stream_stats');
-        const statusBox = document.getElementById('status-box');
-        const viewersBox = document.getElementById('viewers-box').querySelector('p');
-        
-        if (data.status === "online") {
-            statusBox.querySelector('p').textContent = "Online";
-            statusBox.className = "stat-box online";
-            viewersBox.textContent = data.viewer_count;
-        } else {
-            statusBox.querySelector('p').textContent = "Offline";
-            statusBox.className = "stat-box offline";
-        }
+        renderStreamStats(await fetchApi('/api/stream_stats'));
     } catch (e) { console.error(e); }
 }
 
+function renderStreamStats(data) {
+    const statusBox = document.getElementById('status-box');
+    const viewersBox = document.getElementById('viewers-box').querySelector('p');
+    
+    if (data.status === "online") {
+        statusBox.querySelector('p').textContent = "Online";
+        statusBox.className = "stat-box online";
+        viewersBox.textContent = data.viewer_count;
+    } else {
+        statusBox.querySelector('p').textContent = "Offline";
+        statusBox.className = "stat-box offline";
+    }
+    // Push do servidor também traz o canal; não sobrescreve o título enquanto alguém edita
+    const title = document.getElementById('title');
+    if (data.title != null && title && document.activeElement !== title) title.value = data.title;
+    if (data.category != null) document.getElementById('current-category').textContent = data.category;
+}
+
 async function updateChannelInfo() {
     const title = document.getElementById('title').value;
     // Nota: Lógica de busca de jogo simplificada para brevidade
@@ -23,6 +23,24 @@ export async function fetchApi(url, options = {}) {
         window.location.reload();
         throw new Error("Sessão expirada");
     }
-    if (!response.ok) throw new Error(await response.text());
+    if (!response.ok) {
+        const error = new Error(await response.text());
+        error.status = response.status;
+        throw error;
+    }
     return response.json();
-}
\ No newline at end of file
+}
+// GET condicional: envia o ETag que já temos e devolve { status, etag, data }.
+// Em 304 o corpo não vem (data = null) e o cache local continua válido.
+export async function fetchConditional(url, etag = null) {
+    const headers = etag ? { 'If-None-Match': `"${etag}"` } : {};
+    const response = await fetch(url, { headers, cache: 'no-store' });
+    if (response.status === 401) {
+        window.location.reload();
+        throw new Error("Sessão expirada");
+    }
+    const newEtag = (response.headers.get('ETag') || '').replace(/^W\//, '').replace(/"/g, '') || etag;
+    if (response.status === 304) return { status: 304, etag: newEtag, data: null };
+    if (!response.ok) throw new Error(await response.text());
+    return { status: response.status, etag: newEtag, data: await response.json() };
+}